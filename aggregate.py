@@ -0,0 +1,107 @@
+#  리뷰-측면 행렬 집계
+#  ABSA 결과를 int8 리뷰-측면 행렬로 한 번에 변환하고, 측면별 긍정/부정 개수, 비율, Top-k 를 일괄 계산한다.
+#
+#  Review-Aspect Matrix: [-1:neg, 0:null, 1:pos]
+
+import collections
+
+import numpy as np
+
+AspectSummary = collections.namedtuple("AspectSummary", ["pos_count", "neg_count", "total_count", "ratio"])
+
+
+def scatter_review_aspect(masked_corpus_info, result_1, result_2, review_count, aspect_count):
+    """
+        _aspect_mask_to_corpus 의 masked_corpus_info 와 ABSA 결과로 리뷰-측면 행렬 생성
+
+        ##### parms info #####
+        masked_corpus_info: list of [review index, aspect index 1, aspect index 2] (없는 aspect 는 -1)
+        result_1, result_2: ABSA rate (M * 3), ABSA Classifier Label: [0:neg, 1:null, 2:pos]
+        review_count, aspect_count: 행렬 크기
+
+        (label matrix (N * aspect, int8), confidence matrix (N * aspect, float32)) 를 반환한다.
+    """
+    review_matrix = np.zeros((review_count, aspect_count), dtype=np.int8)
+    confidence = np.zeros((review_count, aspect_count), dtype=np.float32)
+    if len(masked_corpus_info) == 0:
+        return review_matrix, confidence
+
+    info = np.asarray(masked_corpus_info, dtype=np.int64).reshape(-1, 3)
+    for column, result in [(1, result_1), (2, result_2)]:
+        valid = info[:, column] != -1
+        rows = info[valid, 0]
+        cols = info[valid, column]
+        review_matrix[rows, cols] = np.argmax(result[valid], axis=1) - 1
+        confidence[rows, cols] = np.max(result[valid], axis=1)
+
+    return review_matrix, confidence
+
+
+def summarize(review_matrix, group=None, group_count=None):
+    """
+        측면별 긍정/부정 개수 및 긍정 비율
+
+        ##### parms info #####
+        review_matrix: 리뷰-측면 행렬 (N * aspect)
+        group: 리뷰별 그룹 index (ex. 여러 영화의 리뷰를 합친 경우 영화 index), None 이면 전체를 하나로 집계
+        group_count: 그룹 개수
+
+        group 이 None 이면 각 값은 (aspect,) 크기, 아니면 (group, aspect) 크기이다.
+        분석된 리뷰가 없는 측면의 ratio 는 nan 이다.
+    """
+    aspect_count = review_matrix.shape[1]
+
+    if group is None:
+        pos_count = np.count_nonzero(review_matrix == 1, axis=0)
+        neg_count = np.count_nonzero(review_matrix == -1, axis=0)
+    else:
+        group = np.asarray(group, dtype=np.int64)
+        if group_count is None:
+            group_count = int(group.max()) + 1 if group.shape[0] > 0 else 0
+        size = group_count * aspect_count
+
+        rows, cols = np.nonzero(review_matrix == 1)
+        pos_count = np.bincount(group[rows] * aspect_count + cols, minlength=size).reshape(group_count, -1)
+        rows, cols = np.nonzero(review_matrix == -1)
+        neg_count = np.bincount(group[rows] * aspect_count + cols, minlength=size).reshape(group_count, -1)
+
+    total_count = pos_count + neg_count
+    ratio = np.full(total_count.shape, np.nan)
+    np.divide(pos_count, total_count, out=ratio, where=total_count > 0)
+
+    return AspectSummary(pos_count, neg_count, total_count, ratio)
+
+
+def top_k(total_count, k):
+    """
+        분석된 리뷰가 많은 순서로 k 개의 측면 index 반환 (마지막 축 기준)
+        개수가 같으면 index 가 큰 측면이 먼저 온다. (기존 np.argsort(total_count)[::-1] 순서)
+    """
+    k = min(k, total_count.shape[-1])
+    return np.argsort(total_count, axis=-1, kind="stable")[..., ::-1][..., :k]
+
+
+class RunningSummary:
+    """
+        리뷰-측면 행렬을 나누어 받으며 측면별 긍정/부정 개수를 누적 (streaming 분석용)
+
+        ##### parms info #####
+        aspect_count: 측면 개수
+
+        summary() 는 지금까지 받은 행렬을 모두 합쳐 summarize() 한 결과와 같다.
+    """
+    def __init__(self, aspect_count):
+        self.review_count = 0
+        self.pos_count = np.zeros(aspect_count, dtype=np.int64)
+        self.neg_count = np.zeros(aspect_count, dtype=np.int64)
+
+    def update(self, review_matrix):
+        self.review_count += review_matrix.shape[0]
+        self.pos_count += np.count_nonzero(review_matrix == 1, axis=0)
+        self.neg_count += np.count_nonzero(review_matrix == -1, axis=0)
+
+    def summary(self):
+        total_count = self.pos_count + self.neg_count
+        ratio = np.full(total_count.shape, np.nan)
+        np.divide(self.pos_count, total_count, out=ratio, where=total_count > 0)
+        return AspectSummary(self.pos_count.copy(), self.neg_count.copy(), total_count, ratio)
@@ -0,0 +1,99 @@
+#  Tokenization 결과를 디스크에 저장하여 재사용
+#  token_ids / valid_length / segment_ids / labels 를 각각 연속된 numpy 배열(.npy)로 저장하고,
+#  이후 실행에서는 memory-map 으로 불러오기 때문에 여러 process 가 같은 page 를 공유할 수 있다.
+
+import kobert.utils
+import model as md
+
+import numpy as np
+
+import os
+import shutil
+import hashlib
+import logging
+
+CACHE_FIELDS = ["token_ids", "valid_length", "segment_ids", "labels"]
+
+
+def corpus_cache_key(corpus_path, sentence_idx, label_idx, max_len):
+    """
+        cache key 생성
+
+        말뭉치 파일 hash, tokenizer vocab checksum, max_len (및 column index) 가 같을 때만 cache 를 재사용한다.
+    """
+    key = "{}-{}-{}-{}-{}".format(kobert.utils._md5sum(corpus_path), kobert.utils.tokenizer['chksum'],
+                                  max_len, sentence_idx, label_idx)
+    return hashlib.md5(key.encode('utf-8')).hexdigest()[:16]
+
+
+def build_corpus_cache(cache_path, corpus_path, sentence_idx, label_idx, max_len, bert_tokenizer,
+                       num_workers=0, chunk_size=2048, native_tokenizer=True):
+    """
+        말뭉치를 tokenization 하여 cache_path 디렉토리에 저장
+    """
+    import gluonnlp as nlp
+
+    dataset = nlp.data.TSVDataset(corpus_path, field_indices=[sentence_idx, label_idx], num_discard_samples=1)
+    bert_dataset = md.ColumnarBERTDataset.from_records(dataset, 0, 1, bert_tokenizer, max_len,
+                                                       num_workers=num_workers, chunk_size=chunk_size,
+                                                       native_tokenizer=native_tokenizer)
+
+    arrays = {
+        "token_ids": bert_dataset.token_ids,
+        "valid_length": bert_dataset.valid_length.astype(np.int32),
+        "segment_ids": np.zeros_like(bert_dataset.token_ids),
+        "labels": bert_dataset.labels,
+    }
+
+    # 임시 디렉토리에 저장한 후 rename (다른 process 가 불완전한 cache 를 읽지 않도록)
+    tmp_path = "{}.tmp-{}".format(cache_path, os.getpid())
+    os.makedirs(tmp_path, exist_ok=True)
+    for field in CACHE_FIELDS:
+        np.save(os.path.join(tmp_path, field + ".npy"), arrays[field])
+
+    try:
+        os.rename(tmp_path, cache_path)
+    except OSError:
+        # 다른 process 가 먼저 cache 를 생성한 경우
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+    return cache_path
+
+
+class MemmapBERTDataset(md.ColumnarBERTDataset):
+    """
+        memory-map 으로 불러온 tokenization cache
+
+        copy-on-write mode 로 불러오므로 torch.from_numpy 로 복사 없이 tensor 를 만들 수 있고,
+        수정하지 않는 한 page 는 여러 process 간에 공유된다.
+    """
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        arrays = [np.load(os.path.join(cache_path, field + ".npy"), mmap_mode='c') for field in CACHE_FIELDS]
+        token_ids, valid_length, segment_ids, labels = arrays
+        super(MemmapBERTDataset, self).__init__(token_ids, valid_length, labels, segment_ids)
+
+
+def get_cached_bert_dataset(corpus_path, sentence_idx, label_idx, max_len, vocab=None, bert_tokenizer=None,
+                            cachedir='~/kobert/corpus/', num_workers=0, chunk_size=2048, native_tokenizer=True):
+    """
+        get_bert_dataset 의 cache 버전
+
+        cache 가 존재하면 tokenization 없이 바로 memory-map 으로 불러온다.
+    """
+    f_cachedir = os.path.expanduser(cachedir)
+    os.makedirs(f_cachedir, exist_ok=True)
+    cache_path = os.path.join(f_cachedir, corpus_cache_key(corpus_path, sentence_idx, label_idx, max_len))
+
+    if not os.path.isdir(cache_path):
+        if not vocab and not bert_tokenizer:
+            # vocab or bert_tokenizer must be required
+            logging.error("vocab or bert_tokenizer is required to build corpus cache")
+            return None
+
+        if bert_tokenizer is None:
+            bert_tokenizer = md.get_bert_tokenizer(vocab)
+        build_corpus_cache(cache_path, corpus_path, sentence_idx, label_idx, max_len, bert_tokenizer,
+                           num_workers=num_workers, chunk_size=chunk_size, native_tokenizer=native_tokenizer)
+
+    return MemmapBERTDataset(cache_path)
@@ -0,0 +1,76 @@
+#  저장해 둔 Daum grade page HTML 로 ReviewSpider parsing 속도를 측정한다 (network 를 사용하지 않는다)
+#
+#  사용법: python -m crawler.benchmark <fixture directory> [--repeat 20]
+#  fixture directory 의 *.html file 을 각각 한 page 로 사용한다.
+#
+#  crawler/fixtures 에는 grade page 구조만 남기고 리뷰 / 작성자를 예시 문장으로 바꾼 page 가 들어 있다.
+#  실제 page 로 측정하려면 crawl 후 .scrapy/httpcache 에 저장된 응답 body (gzip) 를 풀어 *.html 로 저장하거나
+#  browser 에서 grade page (https://movie.daum.net/moviedb/grade?movieId=<id>&page=<n>) 를 저장하여 사용한다.
+
+import argparse
+import glob
+import os
+import time
+
+from scrapy.http import HtmlResponse, Request
+
+from crawler.items import CrawlerItem
+from crawler.spiders.reviewbot import ReviewSpider
+
+MOVIE_URL = "https://movie.daum.net/moviedb/main?movieId=0"
+FIXTURE_URL = MOVIE_URL.replace("main", "grade") + "&page={}"
+
+
+def load_fixtures(fixture_dir):
+    """
+        fixture directory 의 HTML file 목록 (이름 순) 을 읽어 [(file 이름, body)] 반환
+    """
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(fixture_dir, "*.html"))):
+        with open(path, "rb") as f:
+            fixtures.append((os.path.basename(path), f.read()))
+    return fixtures
+
+
+def replay(fixtures, repeat=1):
+    """
+        fixture 를 spider callback 으로 repeat 번 parsing, (page 수, item 수, 소요 시간) 반환
+
+        response 는 매번 새로 만들어 HTML parsing 시간도 포함한다.
+    """
+    spider = ReviewSpider(domain=MOVIE_URL, page_window=1)
+    pages = 0
+    items = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page, (_, body) in enumerate(fixtures, 1):
+            url = FIXTURE_URL.format(page)
+            response = HtmlResponse(url, body=body, encoding="utf-8", request=Request(url))
+            for result in spider.parse_review_n_rank(response, page=page):
+                if isinstance(result, CrawlerItem):
+                    items += 1
+            pages += 1
+    return pages, items, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="replay saved grade pages through ReviewSpider")
+    parser.add_argument("fixture_dir", help="directory of saved grade page *.html files")
+    parser.add_argument("--repeat", type=int, default=20, help="number of passes over the fixtures")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixture_dir)
+    if not fixtures:
+        parser.error("no *.html fixtures in {}".format(args.fixture_dir))
+
+    # 첫 실행 (import, XPath 준비 등) 은 측정에서 제외
+    replay(fixtures[:1])
+    pages, items, elapsed = replay(fixtures, args.repeat)
+    print("fixtures: {}, passes: {}".format(len(fixtures), args.repeat))
+    print("pages: {} ({:.1f} pages/s)".format(pages, pages / elapsed))
+    print("items: {} ({:.1f} items/s)".format(items, items / elapsed))
+    print("elapsed: {:.3f}s".format(elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#  영화 리뷰 중복 제거
+#  정규화된 리뷰의 hash 로 완전히 같은 리뷰를, 문자 n-gram MinHash + LSH 로 거의 같은 리뷰 (복사 / 붙여넣기 spam 등) 를 찾는다.
+#  영화 (crawl) 마다 새로 만들며, 처음 등장한 리뷰만 남긴다.
+
+import hashlib
+import zlib
+
+import numpy as np
+
+_PRIME = (1 << 31) - 1
+
+
+class ReviewDeduplicator:
+    """
+        정확한 중복 / 유사 중복 리뷰 검출
+
+        ##### parms info #####
+        threshold: 유사 중복으로 판단할 n-gram Jaccard 유사도 (MinHash 추정값)
+        num_perm: MinHash hash 함수 개수
+        bands: LSH band 개수 (num_perm 의 약수, band 당 num_perm / bands 개의 값을 비교)
+        ngram: 문자 n-gram 크기
+        seed: MinHash hash 함수 생성 seed
+
+        check(text) 는 처음 보는 리뷰이면 None, 중복이면 "exact" 또는 "near" 를 반환한다.
+        남긴 리뷰의 MinHash signature 만 저장하므로 memory 는 리뷰당 num_perm * 4 byte 정도이다.
+    """
+    def __init__(self, threshold=0.9, num_perm=128, bands=16, ngram=3, seed=1):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be a multiple of bands")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.ngram = ngram
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, _PRIME, size=num_perm).astype(np.uint64)
+
+        self._exact = set()
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = []
+
+        self.exact_count = 0
+        self.near_count = 0
+
+    @property
+    def dropped_count(self):
+        return self.exact_count + self.near_count
+
+    def _shingles(self, text):
+        # 공백은 제거하지 않는다 (띄어쓰기만 다른 리뷰도 n-gram 대부분이 같다)
+        if len(text) <= self.ngram:
+            return {text}
+        return {text[i:i + self.ngram] for i in range(len(text) - self.ngram + 1)}
+
+    def signature(self, text):
+        shingles = np.array([zlib.crc32(shingle.encode("utf-8")) for shingle in self._shingles(text)],
+                            dtype=np.uint64)
+        # (a * x + b) mod p, 모든 hash 함수를 한 번에 계산
+        hashes = (self._a[:, None] * shingles[None, :] + self._b[:, None]) % _PRIME
+        return hashes.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def check(self, text):
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+        if digest in self._exact:
+            self.exact_count += 1
+            return "exact"
+        self._exact.add(digest)
+
+        signature = self.signature(text)
+        band_keys = self._band_keys(signature)
+
+        # 같은 band 를 공유하는 후보만 signature 로 유사도 추정
+        candidates = set()
+        for bucket, key in zip(self._buckets, band_keys):
+            candidates.update(bucket.get(key, ()))
+        for idx in candidates:
+            if np.count_nonzero(self._signatures[idx] == signature) >= self.threshold * self.num_perm:
+                self.near_count += 1
+                return "near"
+
+        idx = len(self._signatures)
+        self._signatures.append(signature)
+        for bucket, key in zip(self._buckets, band_keys):
+            bucket.setdefault(key, []).append(idx)
+        return None
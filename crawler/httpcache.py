@@ -0,0 +1,44 @@
+#  grade page HTTP 응답 cache 정책
+#  최근 리뷰가 추가되는 앞쪽 page 는 짧게, 나머지 page 는 길게 cache 하고, 기간이 지나면
+#  저장된 ETag / Last-Modified 로 조건부 요청 (304 이면 cache 사용) 을 보낸다.
+#  offline 모드에서는 network 를 사용하지 않고 cache 된 응답만 사용한다.
+
+import re
+
+from scrapy.extensions.httpcache import RFC2616Policy
+
+# offline 모드: cache 된 응답은 기간과 관계없이 사용하고, cache 에 없는 요청은 무시한다
+OFFLINE_SETTINGS = {
+    "HTTPCACHE_ENABLED": True,
+    "HTTPCACHE_POLICY": "scrapy.extensions.httpcache.DummyPolicy",
+    "HTTPCACHE_IGNORE_MISSING": True,
+    "RETRY_ENABLED": False,
+}
+
+
+class FreshnessPolicy(RFC2616Policy):
+    """
+        URL 별 cache 유지 기간을 사용하는 RFC2616 정책
+
+        HTTPCACHE_FRESHNESS_RULES: [(URL 정규식, 유지 기간 (초)), ...] 처음 일치하는 규칙을 사용한다.
+        일치하는 규칙이 없으면 응답의 Cache-Control / Expires header 를 따른다.
+    """
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.freshness_rules = [(re.compile(pattern), int(seconds))
+                                for pattern, seconds in settings.getlist("HTTPCACHE_FRESHNESS_RULES")]
+
+    def _compute_freshness_lifetime(self, response, request, now):
+        for pattern, seconds in self.freshness_rules:
+            if pattern.search(request.url):
+                return seconds
+        return super()._compute_freshness_lifetime(response, request, now)
+
+
+def offline_settings(settings):
+    """
+        settings 복사본에 offline 모드 설정을 적용하여 반환
+    """
+    settings = settings.copy()
+    settings.setdict(OFFLINE_SETTINGS, priority="cmdline")
+    return settings
@@ -10,3 +10,5 @@ class CrawlerItem(scrapy.Item):
     # define the fields for your item here like:
     reviewTitle = scrapy.Field()  # 제목
     reviewText = scrapy.Field()  # 리뷰
+    reviewPage = scrapy.Field()  # 리뷰 page 번호
+    reviewOrder = scrapy.Field()  # page 내 리뷰 순서
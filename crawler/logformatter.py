@@ -0,0 +1,13 @@
+#  짧은 리뷰 / 중복 리뷰는 많이 버려지므로 DropItem log 를 WARNING 대신 DEBUG 로 남긴다
+#  버린 개수는 stats (item_dropped_count, dedup/*) 로 확인한다.
+
+import logging
+
+from scrapy.logformatter import LogFormatter
+
+
+class QuietDropLogFormatter(LogFormatter):
+    def dropped(self, item, exception, response, spider):
+        result = super().dropped(item, exception, response, spider)
+        result['level'] = logging.DEBUG
+        return result
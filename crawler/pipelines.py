@@ -4,22 +4,56 @@
 # export to csv
 # from scrapy.exporters import CsvItemExporter
 from __future__ import unicode_literals
+import logging
 import re
 
-hangul = re.compile('[^ ㄱ-ㅣ가-힣|0-9|a-z|A-Z]+')
+from scrapy.exceptions import DropItem
+
+from crawler.dedup import ReviewDeduplicator
+from crawler.sinks import Review
+
+# 한글 / 숫자 / 영문 이외의 문자, 줄바꿈은 남겨 두었다가 split() 에서 공백으로 처리한다
+_DISALLOWED = re.compile('[^ \nㄱ-ㅣ가-힣|0-9|a-z|A-Z]+')
 
 minLengthReview = 8
 
 
+def normalize_review(fragments):
+    """
+        리뷰 text 조각 목록을 하나의 정규화된 리뷰로 변환
+        (한글 / 숫자 / 영문 이외의 문자 제거, 연속된 공백 / 줄바꿈을 공백 하나로 합침)
+    """
+    return ' '.join(_DISALLOWED.sub('', ' '.join(fragments)).split())
+
+
 class CrawlerPipeline:
     def process_item(self, item, spider):
         return item
 
 
 class TextPipeline(object):
-    count = 0
-    list_csv = []
-    bigTextGradeWraper = []
+    """
+        리뷰 정규화 후 spider 의 review_sink 로 전달
+
+        crawl (spider) 마다 새로 만들어지므로 crawl 사이에 리뷰가 섞이지 않는다.
+        review_sink 가 없으면 (scrapy crawl 로 실행한 경우) 정규화한 item 만 반환한다.
+        DEDUP_ENABLED 이면 같은 영화의 중복 / 유사 중복 리뷰를 버리고 개수를 stats (dedup/exact, dedup/near) 에 기록한다.
+    """
+    def __init__(self, settings=None, stats=None):
+        self.sink = None
+        self.movie = None
+        self.title = None
+        self.stats = stats
+
+        self.dedup = None
+        if settings is not None and settings.getbool('DEDUP_ENABLED'):
+            self.dedup = ReviewDeduplicator(threshold=settings.getfloat('DEDUP_THRESHOLD', 0.9),
+                                            num_perm=settings.getint('DEDUP_NUM_PERM', 128),
+                                            bands=settings.getint('DEDUP_BANDS', 16))
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings, crawler.stats)
 
     """ export to csv
     def open_spider(self, spider):
@@ -28,31 +62,45 @@ class TextPipeline(object):
         self.exporter.start_exporting()
     """
 
+    def open_spider(self, spider):
+        self.sink = getattr(spider, 'review_sink', None)
+        self.movie = spider.base_url
+        if self.sink is not None:
+            self.sink.open(self.movie)
+
     def close_spider(self, spider):
-        self.list_csv.append(self.bigTextGradeWraper)
+        if self.dedup is not None and self.dedup.dropped_count > 0:
+            logging.info("%s: dropped %d exact / %d near duplicate reviews", self.movie,
+                         self.dedup.exact_count, self.dedup.near_count)
+        if self.sink is not None:
+            self.sink.close(self.movie, getattr(spider, 'is_error', False))
+        self.sink = None
 
     def process_item(self, item, spider):
-        if self.count == 0:
-            self.count = 1
-            self.list_csv.append(str(item['reviewTitle'][0]))
+        if self.title is None:
+            self.title = str(item['reviewTitle'][0])
 
         # Regulation
-        for i in range(1, len(item['reviewText'])):
-            item['reviewText'][0] = item['reviewText'][0] + ' ' + item['reviewText'][i]
-        item['reviewText'] = [item['reviewText'][0]]
-        item['reviewText'][0] = re.sub(r"\n", " ", item['reviewText'][0], flags=re.UNICODE)
-        item['reviewText'][0] = hangul.sub('', item['reviewText'][0])
-        item['reviewText'][0] = re.sub(r"\s+", " ", item['reviewText'][0], flags=re.UNICODE)
-        item['reviewText'][0] = item['reviewText'][0].strip(' ')
+        item['reviewText'] = [normalize_review(item['reviewText'])]
 
         # re-label
-        if len(item['reviewText'][0]) < 8:
-            pass
-        else:
-            smallTextGradeWraper = item['reviewText'][0]
-            self.bigTextGradeWraper.append(smallTextGradeWraper)
+        if len(item['reviewText'][0]) < minLengthReview:
+            raise DropItem("review is too short")
 
-            # export to csv
-            # self.exporter.export_item(item)
-            return item
+        # 중복 리뷰 제거
+        if self.dedup is not None:
+            duplicate = self.dedup.check(item['reviewText'][0])
+            if duplicate is not None:
+                if self.stats is not None:
+                    self.stats.inc_value('dedup/{}'.format(duplicate))
+                raise DropItem("{} duplicate review".format(duplicate))
 
+        # export to csv
+        # self.exporter.export_item(item)
+        if self.sink is not None:
+            waiting = self.sink.write(Review(self.movie, self.title, item['reviewPage'], item['reviewOrder'],
+                                             item['reviewText'][0]))
+            if waiting is not None:
+                # sink 가 가득 찬 경우 reactor 를 막지 않고, 자리가 나면 item 처리를 마친다
+                return waiting.addCallback(lambda _: item)
+        return item
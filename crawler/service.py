@@ -0,0 +1,141 @@
+#  여러 영화의 리뷰를 하나의 reactor 에서 동시에 crawling 하는 service
+#  twisted reactor 는 process 당 한 번만 실행할 수 있으므로, daemon thread 에서 계속 실행해 두고
+#  crawl 요청을 reactor thread 로 전달한다.
+
+import collections
+import threading
+
+from crawler.sinks import ListSink, QueueSink
+
+MovieReviews = collections.namedtuple("MovieReviews", ["url", "title", "reviews", "is_error"])
+
+_DONE = object()
+
+
+class CrawlService:
+    """
+        영화 리뷰 crawl service
+
+        ##### parms info #####
+        bot: spider 이름
+        settings: scrapy settings (None 이면 project settings)
+
+        crawl 함수의 offline=True 이면 network 를 사용하지 않고 HTTP cache 에 저장된 응답만 사용한다.
+
+        crawl_many() 는 여러 번 호출할 수 있으며, 호출 thread 는 결과가 모두 모일 때까지 기다린다.
+        crawl_iter() 는 리뷰가 도착하는 대로 반환하며, crawl_to() 는 리뷰를 지정한 sink 로만 전달한다.
+    """
+    def __init__(self, bot="reviewbot.py", settings=None):
+        from scrapy.crawler import CrawlerRunner
+        from scrapy.utils.log import configure_logging
+        from scrapy.utils.project import get_project_settings
+        from scrapy.utils.reactor import install_reactor
+
+        if settings is None:
+            settings = get_project_settings()
+        configure_logging(settings)
+
+        # TWISTED_REACTOR 가 지정된 경우 reactor 를 import 하기 전에 설치한다
+        if settings.get("TWISTED_REACTOR"):
+            install_reactor(settings.get("TWISTED_REACTOR"))
+        from twisted.internet import reactor
+
+        self.bot = bot
+        self.reactor = reactor
+        self.settings = settings
+        self.runner = CrawlerRunner(settings)
+        self._offline_runner = None
+
+        self._thread = threading.Thread(target=reactor.run, kwargs={"installSignalHandlers": False},
+                                        name="crawl-reactor", daemon=True)
+        self._thread.start()
+
+    def _get_runner(self, offline):
+        # offline runner 는 같은 reactor 를 사용하며, 처음 요청할 때 만든다
+        if not offline:
+            return self.runner
+        if self._offline_runner is None:
+            from scrapy.crawler import CrawlerRunner
+            from crawler.httpcache import offline_settings
+
+            self._offline_runner = CrawlerRunner(offline_settings(self.settings))
+        return self._offline_runner
+
+    def _crawl_many(self, urls, sink, spider_kwargs, offline=False):
+        # reactor thread 에서 실행, 모든 영화가 끝나면 완료되는 deferred 반환
+        from twisted.internet import defer
+
+        runner = self._get_runner(offline)
+        deferreds = [runner.crawl(self.bot, domain=url, review_sink=sink, **spider_kwargs) for url in urls]
+        return defer.gatherResults(deferreds, consumeErrors=True)
+
+    def crawl_to(self, urls, sink, offline=False, **spider_kwargs):
+        """
+            여러 영화를 동시에 crawling 하여 리뷰를 sink (crawler.sinks) 로 전달, 모두 끝날 때까지 기다린다
+        """
+        from twisted.internet import threads
+
+        threads.blockingCallFromThread(self.reactor, self._crawl_many, list(urls), sink, spider_kwargs, offline)
+        return sink
+
+    def crawl_many(self, urls, offline=False, **spider_kwargs):
+        """
+            여러 영화 URL 을 동시에 crawling 하여 URL 순서대로 MovieReviews 목록 반환
+        """
+        urls = list(urls)
+        sink = self.crawl_to(urls, ListSink(), offline=offline, **spider_kwargs)
+        return [MovieReviews(url, *sink.result(url)) for url in urls]
+
+    def crawl(self, url, offline=False, **spider_kwargs):
+        return self.crawl_many([url], offline=offline, **spider_kwargs)[0]
+
+    def crawl_iter(self, urls, maxsize=1024, offline=False, **spider_kwargs):
+        """
+            여러 영화를 동시에 crawling 하며 정규화된 리뷰 (crawler.sinks.Review) 를 도착하는 대로 반환
+            영화가 끝나면 crawler.sinks.MovieEnd 를 반환한다.
+
+            ##### parms info #####
+            maxsize: 아직 소비하지 않은 리뷰를 쌓아 둘 개수 (가득 차면 소비할 때까지 crawling 을 미룬다)
+
+            page 를 동시에 요청하므로 리뷰는 도착 순서대로 반환된다 (Review.page / Review.order 로 정렬 가능).
+        """
+        from twisted.python.failure import Failure
+
+        urls = list(urls)
+        sink = QueueSink(maxsize, self.reactor)
+
+        def start():
+            deferred = self._crawl_many(urls, sink, spider_kwargs, offline)
+            deferred.addCallbacks(lambda _: sink.finish(_DONE), sink.finish)
+
+        self.reactor.callFromThread(start)
+        try:
+            while True:
+                value = sink.get()
+                if value is _DONE:
+                    return
+                if isinstance(value, Failure):
+                    value.raiseException()
+                yield value
+        finally:
+            # 중간에 소비를 멈추면 남은 리뷰는 버린다 (reactor thread 가 queue 에서 기다리지 않도록)
+            sink.cancel()
+
+    def stop(self):
+        self.reactor.callFromThread(self.reactor.stop)
+        self._thread.join()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_crawl_service(bot="reviewbot.py"):
+    """
+        process 에서 공유하는 CrawlService (reactor 는 한 번만 시작된다)
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = CrawlService(bot)
+    return _service
@@ -34,10 +34,36 @@ CONCURRENT_REQUESTS_PER_IP = 256
 
 # Disable cookies (enabled by default)
 COOKIES_ENABLED = False
-RETRY_ENABLED = False
+RETRY_ENABLED = True
+RETRY_TIMES = 2
 DOWNLOAD_TIMEOUT = 15
 REDIRECT_ENABLED = False
 AJAXCRAWL_ENABLED = True
 
 # Crawl responsibly by identifying yourself (and your website) on the user-agent
 # USER_AGENT = 'crawler (+http://www.yourdomain.com)'
+
+# 리뷰 page 를 동시에 요청하는 개수 (마지막 page 를 알기 전까지 앞의 page 를 미리 요청)
+REVIEW_PAGE_WINDOW = 8
+
+# grade page 응답 cache (.scrapy/httpcache), 유지 기간이 지나면 ETag / Last-Modified 로 조건부 요청
+# 최신 리뷰가 앞쪽 page 에 추가되면 뒤쪽 page 의 리뷰가 밀리므로, 유지 기간 동안은 page 경계의 리뷰가 중복되거나 빠질 수 있다
+HTTPCACHE_ENABLED = True
+HTTPCACHE_DIR = 'httpcache'
+HTTPCACHE_POLICY = 'crawler.httpcache.FreshnessPolicy'
+HTTPCACHE_STORAGE = 'scrapy.extensions.httpcache.FilesystemCacheStorage'
+HTTPCACHE_GZIP = True
+HTTPCACHE_ALWAYS_STORE = True
+HTTPCACHE_IGNORE_RESPONSE_CACHE_CONTROLS = ['no-cache', 'no-store', 'max-age']
+HTTPCACHE_IGNORE_HTTP_CODES = [500, 502, 503, 504]
+HTTPCACHE_FRESHNESS_RULES = [
+    (r'/grade\?.*\bpage=1(&|$)', 600),  # 첫 page: 10 분
+    (r'/grade\?', 6 * 3600),  # 나머지 page: 6 시간
+]
+
+# 같은 영화의 중복 리뷰 제거 (정확한 중복: hash, 유사 중복: 문자 3-gram MinHash + LSH)
+DEDUP_ENABLED = True
+DEDUP_THRESHOLD = 0.9  # 유사 중복으로 판단할 Jaccard 유사도
+DEDUP_NUM_PERM = 128
+DEDUP_BANDS = 16
+LOG_FORMATTER = 'crawler.logformatter.QuietDropLogFormatter'
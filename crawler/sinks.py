@@ -0,0 +1,183 @@
+#  TextPipeline 이 정규화한 리뷰를 받는 출력 (sink)
+#  pipeline 은 crawl 마다 새로 만들어지며, 리뷰가 도착할 때마다 sink 에 바로 전달하므로
+#  리뷰를 모두 모으는 ListSink 를 제외하면 리뷰 수와 관계없이 memory 사용량이 일정하다.
+#  모든 method 는 reactor thread 에서 호출되며, 리뷰와 결과는 영화 (spider 의 base_url) 단위로 구분된다.
+
+import collections
+import json
+import os
+import queue
+import re
+import threading
+
+Review = collections.namedtuple("Review", ["movie", "title", "page", "order", "text"])
+MovieEnd = collections.namedtuple("MovieEnd", ["movie", "title", "count", "is_error"])
+
+
+class ReviewSink:
+    """
+        sink 기본 class
+
+        open(movie) -> write(review) ... -> close(movie, is_error) 순서로 호출된다.
+        write() 는 None 또는 (출력할 곳이 가득 찬 경우) 자리가 나면 완료되는 Deferred 를 반환한다.
+    """
+    def open(self, movie):
+        pass
+
+    def write(self, review):
+        raise NotImplementedError
+
+    def close(self, movie, is_error=False):
+        pass
+
+
+class ListSink(ReviewSink):
+    """
+        영화별 리뷰를 모두 모아 두는 sink (crawl 결과를 한 번에 반환할 때 사용)
+
+        page 를 동시에 요청하므로 close() 에서 page / page 내 순서로 정렬한다.
+    """
+    def __init__(self):
+        self.titles = {}
+        self.reviews = collections.defaultdict(list)
+        self.errors = {}
+
+    def write(self, review):
+        self.titles.setdefault(review.movie, review.title)
+        self.reviews[review.movie].append(review)
+
+    def close(self, movie, is_error=False):
+        self.reviews[movie].sort(key=lambda review: (review.page, review.order))
+        self.errors[movie] = is_error
+
+    def result(self, movie):
+        """
+            (영화 제목, 리뷰 목록, is_error)
+        """
+        return (self.titles.get(movie, ""), [review.text for review in self.reviews.get(movie, [])],
+                self.errors.get(movie, False))
+
+
+class QueueSink(ReviewSink):
+    """
+        크기가 제한된 queue 로 리뷰를 전달하는 sink
+
+        ##### parms info #####
+        maxsize: queue 에 쌓아 둘 리뷰 수 (이 이상 쌓이면 crawling 을 잠시 멈춘다)
+        reactor: crawl 이 실행되는 twisted reactor
+
+        queue 가 가득 차면 write() 가 Deferred 를 반환하고, 소비하는 쪽이 꺼내 가서 자리가 나면 reactor thread 에서
+        Deferred 를 완료한다. reactor thread 는 기다리지 않으므로 다른 crawl 과 network I/O 는 계속 진행되며,
+        TextPipeline 이 Deferred 를 반환하는 동안 scrapy 가 해당 response 의 처리를 미뤄 download 속도가 소비 속도에 맞춰진다.
+        (동시에 처리 중인 item 만큼 maxsize 를 조금 넘을 수 있다)
+        영화가 끝나면 MovieEnd 를 넣는다. cancel() 후에는 들어오는 리뷰를 버린다.
+    """
+    def __init__(self, maxsize=1024, reactor=None):
+        if reactor is None:
+            from twisted.internet import reactor
+        self.maxsize = maxsize
+        self.reactor = reactor
+        self.queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._waiters = []
+        self._cancelled = False
+        self._titles = {}
+        self._counts = collections.Counter()
+
+    def write(self, review):
+        # reactor thread 에서 호출
+        if self._cancelled:
+            return None
+        self._titles.setdefault(review.movie, review.title)
+        self._counts[review.movie] += 1
+
+        with self._lock:
+            self.queue.put(review)
+            if self.queue.qsize() < self.maxsize:
+                return None
+            from twisted.internet import defer
+
+            waiter = defer.Deferred()
+            self._waiters.append(waiter)
+            return waiter
+
+    def close(self, movie, is_error=False):
+        if not self._cancelled:
+            self.queue.put(MovieEnd(movie, self._titles.pop(movie, ""), self._counts.pop(movie, 0), is_error))
+
+    def finish(self, value):
+        # crawl 이 모두 끝나면 (또는 실패하면) service 가 호출
+        self.queue.put(value)
+
+    def _release(self, force=False):
+        # 소비하는 thread 에서 호출, 기다리는 Deferred 는 reactor thread 에서 완료한다
+        with self._lock:
+            if not self._waiters or (not force and self.queue.qsize() >= self.maxsize):
+                return
+            waiters, self._waiters = self._waiters, []
+        self.reactor.callFromThread(self._fire, waiters)
+
+    @staticmethod
+    def _fire(waiters):
+        for waiter in waiters:
+            waiter.callback(None)
+
+    def get(self):
+        value = self.queue.get()
+        self._release()
+        return value
+
+    def cancel(self):
+        self._cancelled = True
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        self._release(force=True)
+
+
+class JsonlShardSink(ReviewSink):
+    """
+        영화별 JSONL file 로 리뷰를 저장하는 sink
+
+        ##### parms info #####
+        directory: 저장 directory
+        shard_size: shard file 하나에 저장할 최대 리뷰 수 (넘으면 다음 shard 로 넘어간다)
+
+        file 이름은 <영화 id>-<shard 번호>.jsonl 이며, 영화마다 열려 있는 file 은 하나뿐이다.
+    """
+    def __init__(self, directory, shard_size=10000):
+        self.directory = os.path.expanduser(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.shard_size = shard_size
+        self.paths = collections.defaultdict(list)
+        self._files = {}
+        self._counts = collections.Counter()
+
+    @staticmethod
+    def movie_id(movie):
+        match = re.search(r"movieId=(\w+)", movie)
+        return match.group(1) if match else re.sub(r"\W+", "_", movie)
+
+    def _rotate(self, movie):
+        if movie in self._files:
+            self._files[movie].close()
+        path = os.path.join(self.directory, "{}-{:05d}.jsonl".format(self.movie_id(movie), len(self.paths[movie])))
+        self.paths[movie].append(path)
+        self._files[movie] = open(path, "w", encoding="utf-8")
+
+    def open(self, movie):
+        self._rotate(movie)
+
+    def write(self, review):
+        if self._counts[review.movie] and self._counts[review.movie] % self.shard_size == 0:
+            self._rotate(review.movie)
+        self._counts[review.movie] += 1
+        self._files[review.movie].write(json.dumps(review._asdict(), ensure_ascii=False) + "\n")
+
+    def close(self, movie, is_error=False):
+        f = self._files.pop(movie, None)
+        if f is not None:
+            f.close()
+        self._counts.pop(movie, None)
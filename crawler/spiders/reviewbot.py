@@ -1,44 +1,91 @@
 import scrapy
 import os
+from lxml import etree
 from crawler.items import CrawlerItem
-from crawler.utils import MovieCrawler
 
-item = CrawlerItem()
-utils = MovieCrawler()
+# grade page 의 XPath 는 한 번만 compile 하고, 리뷰 목록은 리뷰 영역 element 기준 상대 경로로 찾는다
+REVIEW_AREA = etree.XPath('//*[@id="mArticle"]/div[2]/div[2]/div[1]')
+REVIEW_TITLE = etree.XPath('//*[@id="mArticle"]/div[1]/a/h2/text()')
+NO_REVIEW = etree.XPath('p')  # 리뷰가 없는 page 의 안내 문구
+REVIEW_LIST = etree.XPath('ul/li')
+REVIEW_TEXT = etree.XPath('div/p/text()')
+
+
+def parse_grade_page(root):
+    """
+        이미 parse 된 grade page (lxml element) 에서 (영화 제목 목록, 리뷰별 text 목록) 반환
+        리뷰가 없는 page 이면 None 반환
+    """
+    review_text_list = []
+    for area in REVIEW_AREA(root):
+        if NO_REVIEW(area):
+            return None
+        review_text_list.extend([str(text) for text in REVIEW_TEXT(li)] for li in REVIEW_LIST(area))
+    return [str(title) for title in REVIEW_TITLE(root)], review_text_list
+
 
 class ReviewSpider(scrapy.Spider):
     name = os.path.basename(__file__)
     base_url = "https://movie.daum.net/moviedb/main?movieId=1"
-    current_page = 1
     handle_httpstatus_list = [500]
+    is_end = False
+    is_error = False
 
-    def __init__(self, domain=''):
+    def __init__(self, domain='', page_window=None, review_sink=None):
         self.base_url = str(domain)
+        self.review_sink = review_sink  # TextPipeline 이 정규화한 리뷰를 전달할 곳 (crawler.sinks)
+        self.grade_url = self.base_url.replace("main", "grade")
+        self.page_window = page_window
+        self.requested_page = 0  # 요청한 가장 큰 page
+        self.last_page = None  # 리뷰가 있는 마지막 page (빈 page 를 만나면 결정된다)
 
     # read data with moving urls
     def start_requests(self):
-        url_part1 = self.base_url.replace("main", "grade")
-        yield scrapy.Request("{0}&page=1".format(url_part1),
-        callback=self.parse_review_n_rank)
+        if self.page_window is None:
+            self.page_window = self.settings.getint('REVIEW_PAGE_WINDOW', 8)
+        self.page_window = max(1, int(self.page_window))
+        yield self.page_request(1)
+
+    def page_request(self, page):
+        self.requested_page = max(self.requested_page, page)
+        return scrapy.Request("{0}&page={1}".format(self.grade_url, page), callback=self.parse_review_n_rank,
+                              cb_kwargs={'page': page}, dont_filter=True)
+
+    def end_at(self, page):
+        # page 이후로는 요청하지 않는다 (이미 요청한 page 의 응답은 parse_review_n_rank 에서 무시)
+        if self.last_page is None or page < self.last_page:
+            self.last_page = page
 
     # read datas in one movie review
-    def parse_review_n_rank(self, response):
+    def parse_review_n_rank(self, response, page=1):
+        # 빈 page 나 오류 page 이후에 도착한 page 는 리뷰 순서에 빈 곳이 생기지 않도록 사용하지 않는다
+        if self.last_page is not None and page > self.last_page:
+            return
+
         # is there review
         if response.status not in self.handle_httpstatus_list:
-            if len(response.xpath('//*[@id="mArticle"]/div[2]/div[2]/div[1]/p')) == 0:
-                numOfli = len(response.xpath('//*[@id="mArticle"]/div[2]/div[2]/div[1]/ul/li').extract())
-                for i in range(1, numOfli+1):
-                    reviewText = response.xpath('//*[@id="mArticle"]/div[2]/div[2]/div[1]/ul/li[{0}]/div/p/text()'.format(i))
-                    reviewTitle = response.xpath('//*[@id="mArticle"]/div[1]/a/h2/text()')
-                    item['reviewTitle'] = reviewTitle.extract()
-                    item['reviewText'] = reviewText.extract()
+            # response 는 한 번만 parse 된다 (response.selector.root)
+            page_info = parse_grade_page(response.selector.root)
+            if page_info is not None:
+                reviewTitle, review_text_list = page_info
+                for i, reviewText in enumerate(review_text_list, 1):
+                    item = CrawlerItem()
+                    item['reviewTitle'] = reviewTitle
+                    item['reviewText'] = reviewText
+                    item['reviewPage'] = page
+                    item['reviewOrder'] = i
                     yield item
 
-                url_part1 = self.base_url.replace("main", "grade")
-                self.current_page = self.current_page+1
-                yield scrapy.Request("{0}&page={1}".format(url_part1, str(self.current_page)),
-                                      callback=self.parse_review_n_rank, dont_filter=True)
+                # 마지막 page 를 알기 전까지 page_window 만큼 앞의 page 를 동시에 요청
+                window_end = page + self.page_window
+                if self.last_page is not None:
+                    window_end = min(window_end, self.last_page)
+                for next_page in range(self.requested_page + 1, window_end + 1):
+                    yield self.page_request(next_page)
             else:
-                utils.is_end = True
+                self.is_end = True
+                self.end_at(page - 1)
         else:
-            utils.is_error = True
\ No newline at end of file
+            # 오류 page 이후의 page 는 더 요청하지 않는다 (기존 순차 crawling 과 같이 오류 page 에서 멈춤)
+            self.is_error = True
+            self.end_at(page - 1)
@@ -1,17 +1,46 @@
-from scrapy.crawler import CrawlerProcess
-from scrapy.utils.project import get_project_settings
-from crawler.pipelines import TextPipeline
+from crawler.service import get_crawl_service
+from crawler.sinks import JsonlShardSink, MovieEnd
 
 
 class MovieCrawler:
     is_error = False
 
-    def __init__(self, bot="reviewbot.py"):
-        self.process = CrawlerProcess(get_project_settings())
+    def __init__(self, bot="reviewbot.py", offline=False):
+        # reactor 를 다시 시작할 수 없으므로 process 에서 하나의 crawl service 를 공유한다
+        self.service = get_crawl_service(bot)
         self.bot = bot
+        self.offline = offline  # True 이면 HTTP cache 에 저장된 page 만 사용
 
     def crawl(self, url):
+        """
+            영화 리뷰 crawling, [영화 제목, 리뷰 목록] 반환 (같은 process 에서 여러 번 호출할 수 있다)
+        """
+        result = self.service.crawl(url, offline=self.offline)
+        self.is_error = result.is_error
+        return [result.title, result.reviews]
+
+    def crawl_many(self, urls):
+        """
+            여러 영화를 동시에 crawling, URL 순서대로 crawler.service.MovieReviews 목록 반환
+        """
+        results = self.service.crawl_many(urls, offline=self.offline)
+        self.is_error = any(result.is_error for result in results)
+        return results
+
+    def crawl_iter(self, urls, maxsize=1024):
+        """
+            리뷰가 도착하는 대로 crawler.sinks.Review 반환, 영화가 끝나면 crawler.sinks.MovieEnd 반환
+            (memory 에는 최대 maxsize 개의 리뷰만 쌓인다)
+        """
         self.is_error = False
-        self.process.crawl(self.bot, domain=url)
-        self.process.start()  # the script will block here until the crawling is finished
-        return TextPipeline.list_csv
+        for value in self.service.crawl_iter(urls, maxsize=maxsize, offline=self.offline):
+            if isinstance(value, MovieEnd):
+                self.is_error = self.is_error or value.is_error
+            yield value
+
+    def crawl_to_jsonl(self, urls, directory, shard_size=10000):
+        """
+            영화별 JSONL shard file 로 리뷰 저장, {URL: shard file 목록} 반환
+        """
+        sink = self.service.crawl_to(urls, JsonlShardSink(directory, shard_size), offline=self.offline)
+        return dict(sink.paths)
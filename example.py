@@ -1,13 +1,16 @@
 import kobert.pytorch_kobert
 import kobert.utils
+import corpus_cache
 import loader
 import model as md
+import sp_tokenizer
+from trainer import Trainer, sa_step, absa_step, aspect_query_step
 
 import gluonnlp as nlp
 import torch
-import transformers
 import numpy as np
 import random
+import time
 
 
 sa_model_path = "model.pt"
@@ -24,99 +27,30 @@ def ex__training(opt=md.DEFAULT_OPTION, ctx="cuda:0"):
     bert_tokenizer = md.get_bert_tokenizer(vocab)
 
     train_data_path, test_data_path = loader.download_corpus_data()  # Naver sentiment movie corpus v1.0
-    dataset_train = md.get_bert_dataset(train_data_path, sentence_idx=1, label_idx=2,
-                                        max_len=opt["max_len"], bert_tokenizer=bert_tokenizer)
-    dataset_test = md.get_bert_dataset(test_data_path, sentence_idx=1, label_idx=2,
-                                       max_len=opt["max_len"], bert_tokenizer=bert_tokenizer)
-
-    # data loader
-    train_dataloader = torch.utils.data.DataLoader(dataset_train, batch_size=opt["batch_size"], num_workers=0)
-    test_dataloader = torch.utils.data.DataLoader(dataset_test, batch_size=opt["batch_size"], num_workers=0)
+    dataset_train = corpus_cache.get_cached_bert_dataset(train_data_path, sentence_idx=1, label_idx=2,
+                                                         max_len=opt["max_len"], bert_tokenizer=bert_tokenizer,
+                                                         num_workers=opt["tokenize_workers"],
+                                                         chunk_size=opt["tokenize_chunk_size"],
+                                                         native_tokenizer=opt["native_tokenizer"])
+    dataset_test = corpus_cache.get_cached_bert_dataset(test_data_path, sentence_idx=1, label_idx=2,
+                                                        max_len=opt["max_len"], bert_tokenizer=bert_tokenizer,
+                                                        num_workers=opt["tokenize_workers"],
+                                                        chunk_size=opt["tokenize_chunk_size"],
+                                                        native_tokenizer=opt["native_tokenizer"])
 
     # model
     model = md.BERTClassifier(bert_model, dr_rate=opt["drop_out_rate"]).to(device)
 
-    no_decay = ['bias', 'LayerNorm.weight']
-    optimizer_grouped_parameters = [
-        {'params': [p for n, p in model.named_parameters() if not any(nd in n for nd in no_decay)],
-         'weight_decay': 0.01},
-        {'params': [p for n, p in model.named_parameters() if any(nd in n for nd in no_decay)], 'weight_decay': 0.0}
-    ]
-    optimizer = transformers.AdamW(optimizer_grouped_parameters, lr=opt["learning_rate"])
-    loss_function = torch.nn.CrossEntropyLoss()
-
-    t_total = len(train_dataloader) * opt["num_epochs"]
-    warmup_steps = int(t_total * opt["warmup_ratio"])
-    scheduler = transformers.optimization.get_linear_schedule_with_warmup(optimizer, warmup_steps, t_total)
-
-    for e in range(opt["num_epochs"]):
-        train_accuracy = 0.0
-        test_accuracy = 0.0
-
-        # Train Batch
-        model.train()
-
-        for batch_id, (token_ids, valid_length, segment_ids, label) in enumerate(train_dataloader):
-            optimizer.zero_grad()
-
-            # set train batch
-            token_ids = token_ids.long().to(device)
-            segment_ids = segment_ids.long().to(device)
-            valid_length = valid_length
-            label = label.long().to(device)
-
-            # get word embedding
-            attention_mask = md.gen_attention_mask(token_ids, valid_length)
-            word_embedding = model.bert.get_input_embeddings()
-            x = word_embedding(token_ids)
-
-            # forward propagation
-            out = model(x, segment_ids, attention_mask)
-
-            # backward propagation
-            loss = loss_function(out, label)
-            loss.backward()
-
-            # optimization
-            torch.nn.utils.clip_grad_norm_(model.parameters(), opt["max_grad_norm"])
-            optimizer.step()
-            scheduler.step()  # Update learning rate schedule
-            train_accuracy += md.calculate_accuracy(out, label)
-
-            if batch_id % opt["log_interval"] == 0:
-                print("epoch {} batch id {} loss {} train accuracy {}".format(e + 1, batch_id + 1,
-                                                                              loss.data.cpu().numpy(),
-                                                                              train_accuracy / (batch_id + 1)))
-        print("epoch {} train accuracy {}".format(e + 1, train_accuracy / (batch_id + 1)))
-
-        # Test Batch
-        model.eval()
-        with torch.no_grad():
-            for batch_id, (token_ids, valid_length, segment_ids, label) in enumerate(test_dataloader):
-                # set test batch
-                token_ids = token_ids.long().to(device)
-                segment_ids = segment_ids.long().to(device)
-                valid_length = valid_length
-                label = label.long().to(device)
-
-                # get word embedding
-                attention_mask = md.gen_attention_mask(token_ids, valid_length)
-                word_embedding = model.bert.get_input_embeddings()
-                x = word_embedding(token_ids)
-
-                # forward propagation
-                out = model(x, segment_ids, attention_mask)
-
-                # test accuracy
-                test_accuracy += md.calculate_accuracy(out, label)
-            print("epoch {} test accuracy {}".format(e + 1, test_accuracy / (batch_id + 1)))
-
-        torch.save(model.state_dict(), sa_model_path)
+    # train / test (중단된 경우 checkpoint 로부터 이어서 학습)
+    trainer = Trainer(model, sa_step, dataset_train, dataset_test, opt, ctx,
+                      model_path=sa_model_path, checkpoint_path=sa_model_path + ".ckpt")
+    trainer.fit()
 
 
 def ex__sentiment_analysis():
     _, corpus_path = loader.download_corpus_data()  # Naver sentiment movie corpus v1.0
-    result, accuracy = md.sentiment_analysis(sa_model_path, corpus_path, sentence_idx=1, label_idx=2, show=True)
+    result, accuracy = md.sentiment_analysis(sa_model_path, corpus_path, sentence_idx=1, label_idx=2, show=True,
+                                             use_cache=True)
     print(f"Sentiment Analysis Accuracy: {'%0.2f' % accuracy * 100}%")
 
     dataset = nlp.data.TSVDataset(corpus_path, field_indices=[1, 2], num_discard_samples=1)
@@ -138,6 +72,96 @@ def ex__sentiment_analysis():
     np.savetxt("sa_correct_case.txt", corpus[result == label], fmt="%s", delimiter=" ", encoding='UTF-8')
 
 
+def _precision_report(title, variants, model_path=absa_model_path, limit=5000):
+    """
+        기준 model 과 변형 model 의 정확도 / 속도 / 예측 일치율 비교
+
+        ##### parms info #####
+        title: 출력할 report 제목
+        variants: [(이름, ABSAModel 생성 인자), (이름, ABSAModel 생성 인자)] - 첫 번째가 기준 (fp32)
+    """
+    _, corpus_path = loader.download_corpus_data()  # Naver sentiment movie corpus v1.0
+
+    report = {}
+    for name, kwargs in variants:
+        model = md.ABSAModel(ctx="cpu", **kwargs)
+        model.load_kobert()
+        model.load_model(model_path)
+        report[name] = model.evaluate(corpus_path, sentence_idx=1, label_idx=2, limit=limit)
+
+    base = report[variants[0][0]]
+    other = report[variants[1][0]]
+    agreement = np.mean(np.argmax(base["result"], axis=1) == np.argmax(other["result"], axis=1))
+    max_diff = np.max(np.abs(base["result"] - other["result"]))
+
+    print("### {} ({} sentences)".format(title, len(base["result"])))
+    for name, _ in variants:
+        print("{}: accuracy {:0.4f}, {:0.1f} sentences/s".format(name, report[name]["accuracy"],
+                                                                  report[name]["sentences_per_sec"]))
+    print("speed-up: x{:0.2f}".format(other["sentences_per_sec"] / base["sentences_per_sec"]))
+    print("prediction agreement: {:0.4f}, max probability diff: {:0.4f}".format(agreement, max_diff))
+
+    return report
+
+
+def ex__quantization_report(model_path=absa_model_path, limit=5000):
+    return _precision_report("Dynamic int8 quantization report",
+                             [("fp32", {"quantize": False}), ("int8", {"quantize": True})], model_path, limit)
+
+
+def ex__bf16_report(model_path=absa_model_path, limit=5000):
+    return _precision_report("bfloat16 autocast report",
+                             [("fp32", {"bf16": False}), ("bf16", {"bf16": True})], model_path, limit)
+
+
+def ex__export_script(model_path=absa_model_path, ctx="cpu"):
+    model = md.ABSAModel(ctx=ctx)
+    model.load_kobert()
+    model.load_model(model_path)
+    model.export_script(model_path.replace(".pt", ".ts"))
+
+    # load artifact without transformers.BertModel
+    script_model = md.ABSAModel(ctx=ctx, backend="script")
+    script_model.load_vocab()
+    script_model.load_model(model_path.replace(".pt", ".ts"))
+    print(script_model.analyze(script_model.tokenize(md.ABSAModel.PARITY_SAMPLE), sa=True, absa=True))
+
+
+def ex__tokenizer_parity(opt=md.DEFAULT_OPTION, limit=None):
+    """
+        sp_tokenizer.BatchSPTokenizer 와 gluonnlp BERTSentenceTransform 결과 비교 (bit-identical 이어야 한다)
+    """
+    _, vocab = kobert.pytorch_kobert.get_pytorch_kobert_model()
+    bert_tokenizer = md.get_bert_tokenizer(vocab)
+    transform = nlp.data.BERTSentenceTransform(bert_tokenizer, max_seq_length=opt["max_len"], pad=True, pair=False)
+    batch_tokenizer = sp_tokenizer.get_batch_tokenizer(vocab, opt["max_len"])
+
+    _, corpus_path = loader.download_corpus_data()  # Naver sentiment movie corpus v1.0
+    corpus_list = [record[0] for record in md.iter_tsv(corpus_path, [1])][:limit]
+    corpus_list += ["", " ", "!!!", "ㅋㅋㅋㅋ", "漢字 혼용 文章", "tab\tnew\nline", "\x00제어�문자",
+                    "전각　공백", "A" * 500, "영화 " * 200]
+
+    start = time.time()
+    expected = [transform([corpus]) for corpus in corpus_list]
+    gluonnlp_time = time.time() - start
+
+    start = time.time()
+    token_ids, valid_length, segment_ids = batch_tokenizer(corpus_list)
+    native_time = time.time() - start
+
+    mismatch = [i for i, sentence in enumerate(expected)
+                if not (np.array_equal(sentence[0], token_ids[i]) and sentence[0].dtype == token_ids.dtype and
+                        int(sentence[1]) == int(valid_length[i]) and np.array_equal(sentence[2], segment_ids[i]))]
+
+    print("### tokenizer parity: {} sentences, {} mismatch".format(len(corpus_list), len(mismatch)))
+    print("gluonnlp: {:0.2f}s, native: {:0.2f}s (x{:0.1f})".format(gluonnlp_time, native_time,
+                                                                   gluonnlp_time / max(native_time, 1e-9)))
+    for i in mismatch[:10]:
+        print("mismatch: {!r}".format(corpus_list[i]))
+
+    return len(mismatch) == 0
+
+
 def ex__ABSA_training(opt=md.DEFAULT_OPTION, ctx="cuda:0"):
     device = torch.device(ctx)
     random.seed(3)
@@ -235,12 +259,14 @@ def ex__ABSA_training(opt=md.DEFAULT_OPTION, ctx="cuda:0"):
 
     # load train / test dataset
     bert_tokenizer = md.get_bert_tokenizer(vocab)
-    dataset_train = md.BERTDataset(train_data_list, 0, 1, bert_tokenizer, opt["max_len"], pad=True, pair=False)
-    dataset_test = md.BERTDataset(test_data_list, 0, 1, bert_tokenizer, opt["max_len"], pad=True, pair=False)
-
-    # data loader
-    train_dataloader = torch.utils.data.DataLoader(dataset_train, batch_size=opt["batch_size"], num_workers=0)
-    test_dataloader = torch.utils.data.DataLoader(dataset_test, batch_size=opt["batch_size"], num_workers=0)
+    dataset_train = md.ColumnarBERTDataset.from_records(train_data_list, 0, 1, bert_tokenizer, opt["max_len"],
+                                                        num_workers=opt["tokenize_workers"],
+                                                        chunk_size=opt["tokenize_chunk_size"],
+                                                        native_tokenizer=opt["native_tokenizer"])
+    dataset_test = md.ColumnarBERTDataset.from_records(test_data_list, 0, 1, bert_tokenizer, opt["max_len"],
+                                                       num_workers=opt["tokenize_workers"],
+                                                       chunk_size=opt["tokenize_chunk_size"],
+                                                       native_tokenizer=opt["native_tokenizer"])
 
     # aspect-based sentiment analysis model
     sa_model = md.BERTClassifier(bert_model, dr_rate=opt["drop_out_rate"]).to(device)
@@ -248,89 +274,84 @@ def ex__ABSA_training(opt=md.DEFAULT_OPTION, ctx="cuda:0"):
     model = md.ABSAClassifier(sa_model.bert, sa_model.classifier,
                               dr_rate_0=opt["drop_out_rate"], dr_rate_1=opt["ABSA_drop_out_rate"]).to(device)
 
-    no_decay = ['bias', 'LayerNorm.weight']
-    optimizer_grouped_parameters = [
-        {'params': [p for n, p in model.named_parameters() if not any(nd in n for nd in no_decay)],
-         'weight_decay': 0.01},
-        {'params': [p for n, p in model.named_parameters() if any(nd in n for nd in no_decay)], 'weight_decay': 0.0}
-    ]
-    optimizer = transformers.AdamW(optimizer_grouped_parameters, lr=opt["learning_rate"])
-    loss_function = torch.nn.CrossEntropyLoss()
-
-    t_total = len(train_dataloader) * opt["num_epochs"]
-    warmup_steps = int(t_total * opt["warmup_ratio"])
-    scheduler = transformers.optimization.get_linear_schedule_with_warmup(optimizer, warmup_steps, t_total)
-
     # ----------- ABSA CLASSIFIER MODEL TRAIN/TEST -------------
     # ----------------------------------------------------------
-    for e in range(opt["num_epochs"]):
-        train_accuracy = 0.0
-        test_accuracy = 0.0
+    trainer = Trainer(model, absa_step, dataset_train, dataset_test, opt, ctx,
+                      model_path=absa_model_path, checkpoint_path=absa_model_path + ".ckpt")
+    trainer.fit()
 
-        # Train Batch
-        model.train()
-        for batch_id, (token_ids, valid_length, segment_ids, label) in enumerate(train_dataloader):
-            optimizer.zero_grad()
 
-            # set train batch
-            token_ids = token_ids.long().to(device)
-            segment_ids = segment_ids.long().to(device)
-            valid_length = valid_length
-            label = label.long().to(device)
+def _aspect_query_target(rows, records, aspect_vocab, num_negative_aspects, rng):
+    """
+        batch 에 사용할 aspect 목록과 정답 행렬 생성
 
-            # get word embedding
-            attention_mask = md.gen_attention_mask(token_ids, valid_length)
-            word_embedding = model.bert.get_input_embeddings()
-            x = word_embedding(token_ids)
-
-            # forward propagation
-            _, out_1, out_2 = model(x, segment_ids, attention_mask, sa=False, absa=True)
-
-            # backward propagation
-            loss = loss_function(out_1, label[:, 0]) + loss_function(out_2, label[:, 1])
-            loss.backward()
-
-            # optimization
-            torch.nn.utils.clip_grad_norm_(model.parameters(), opt["max_grad_norm"])
-            optimizer.step()
-            scheduler.step()  # Update learning rate schedule
+        batch 내 리뷰의 aspect 와 무작위 aspect (rng: numpy Generator) 를 함께 사용한다.
+        정답: 해당 리뷰의 aspect 이면 감성 label, 리뷰에 등장하지 않는 aspect 이면 1 (null),
+        리뷰에 등장하지만 label 이 없는 aspect 는 학습에서 제외 (-100)
+    """
+    aspect_index = {aspect: idx for idx, aspect in enumerate(aspect_vocab)}
+    batch_aspects = set(aspect_index[records[row][1]] for row in rows)
+    batch_aspects.update(rng.integers(0, len(aspect_vocab), num_negative_aspects).tolist())
+    batch_aspects = sorted(batch_aspects)
 
-            accuracy_0 = md.calculate_accuracy(out_1, label[:, 0])
-            accuracy_1 = md.calculate_accuracy(out_2, label[:, 1])
-            train_accuracy += ((accuracy_0 + accuracy_1) / 2)  # Average of correct count
+    target = np.ones((len(rows), len(batch_aspects)), dtype=np.int64)
+    for i, row in enumerate(rows):
+        corpus, aspect, label = records[row]
+        for j, aspect_idx in enumerate(batch_aspects):
+            if aspect_vocab[aspect_idx] == aspect:
+                target[i, j] = label
+            elif aspect_vocab[aspect_idx] in corpus:
+                target[i, j] = -100
 
-            if batch_id % opt["log_interval"] == 0:
-                print("epoch {} batch id {} loss {} train accuracy {}".format(e + 1, batch_id + 1,
-                                                                              loss.data.cpu().numpy(),
-                                                                              train_accuracy / (batch_id + 1)))
-        print("epoch {} train accuracy {}".format(e + 1, train_accuracy / (batch_id + 1)))
+    return batch_aspects, target
 
-        # Test Batch
-        model.eval()
-        with torch.no_grad():
-            for batch_id, (token_ids, valid_length, segment_ids, label) in enumerate(test_dataloader):
-                # set test batch
-                token_ids = token_ids.long().to(device)
-                segment_ids = segment_ids.long().to(device)
-                valid_length = valid_length
-                label = label.long().to(device)
 
-                # get word embedding
-                attention_mask = md.gen_attention_mask(token_ids, valid_length)
-                word_embedding = model.bert.get_input_embeddings()
-                x = word_embedding(token_ids)
+def ex__aspect_query_training(opt=md.DEFAULT_OPTION, ctx="cuda:0", num_negative_aspects=4):
+    device = torch.device(ctx)
+    random.seed(3)
+    np.random.seed(3)
+    # load dataset (ex__ABSA_training 과 동일한 데이터, aspect 치환 없이 원문 사용)
+    total_dataset = nlp.data.TSVDataset("sentiment_dataset.csv", field_indices=[0, 1, 3], num_discard_samples=1)
+    test_count = int(len(total_dataset) * 0.2)  # validation ratio = 0.2
+    records = [[corpus, aspect, 2 if label == "positive" else 0] for corpus, aspect, label in total_dataset]
+    train_records = records[test_count:]
+    test_records = records[:test_count]
+    aspect_vocab = sorted(set(record[1] for record in records))
 
-                # forward propagation
-                _, out_1, out_2 = model(x, segment_ids, attention_mask, sa=False, absa=True)
+    # load bert model
+    bert_model, vocab = kobert.pytorch_kobert.get_pytorch_kobert_model()
+    bert_tokenizer = md.get_bert_tokenizer(vocab)
 
-                # test accuracy
-                accuracy_0 = md.calculate_accuracy(out_1, label[:, 0])
-                accuracy_1 = md.calculate_accuracy(out_2, label[:, 1])
-                test_accuracy += ((accuracy_0 + accuracy_1) / 2)
+    # label 자리에 record index 를 저장하여 batch 마다 aspect 정답 행렬을 생성한다
+    dataset_train = md.ColumnarBERTDataset.from_records([[r[0], i] for i, r in enumerate(train_records)], 0, 1,
+                                                        bert_tokenizer, opt["max_len"],
+                                                        num_workers=opt["tokenize_workers"],
+                                                        chunk_size=opt["tokenize_chunk_size"],
+                                                        native_tokenizer=opt["native_tokenizer"])
+    dataset_test = md.ColumnarBERTDataset.from_records([[r[0], i] for i, r in enumerate(test_records)], 0, 1,
+                                                       bert_tokenizer, opt["max_len"],
+                                                       num_workers=opt["tokenize_workers"],
+                                                       chunk_size=opt["tokenize_chunk_size"],
+                                                       native_tokenizer=opt["native_tokenizer"])
+    aspect_query_list = [[md.aspect_query_text(aspect), 0] for aspect in aspect_vocab]
+    dataset_aspect = md.ColumnarBERTDataset.from_records(aspect_query_list, 0, 1, bert_tokenizer, opt["max_len"],
+                                                         native_tokenizer=opt["native_tokenizer"])
+
+    # aspect query model
+    sa_model = md.BERTClassifier(bert_model, dr_rate=opt["drop_out_rate"]).to(device)
+    model = md.AspectQueryClassifier(sa_model.bert, sa_model.classifier,
+                                     dr_rate_0=opt["drop_out_rate"], dr_rate_1=opt["ABSA_drop_out_rate"]).to(device)
 
-            print("epoch {} test accuracy {}".format(e + 1, test_accuracy / (batch_id + 1)))
+    def make_target(rows, records):
+        # negative aspect 는 opt["seed"] 와 batch 의 record 로 정한다
+        # (평가 결과가 매번 같고, checkpoint 에서 이어서 학습해도 같은 batch 는 같은 aspect 를 사용)
+        rng = np.random.default_rng([opt["seed"], int(records is train_records)] + list(rows))
+        return _aspect_query_target(rows, records, aspect_vocab, num_negative_aspects, rng)
 
-        torch.save(model.state_dict(), "ABSA_model.pt")
+    step = aspect_query_step(make_target, dataset_aspect, train_records, test_records)
+    trainer = Trainer(model, step, dataset_train, dataset_test, opt, ctx, model_path="ABSA_query_model.pt",
+                      checkpoint_path="ABSA_query_model.pt.ckpt", shuffle=True)
+    trainer.fit()
 
 
 def ex__ABSA(model_path=absa_model_path, opt=md.DEFAULT_OPTION, ctx="cuda:0"):
@@ -342,7 +363,8 @@ def ex__ABSA(model_path=absa_model_path, opt=md.DEFAULT_OPTION, ctx="cuda:0"):
 
     corpus = [["오늘 밥먹었는데 정말 최고였어요. 근데 영화 대상 진짜 안좋더라구요", [0, 1]]]
     bert_tokenizer = md.get_bert_tokenizer(vocab)
-    dataset = md.BERTDataset(corpus, 0, 1, bert_tokenizer, opt["max_len"], pad=True, pair=False)
+    dataset = md.BERTDataset(corpus, 0, 1, bert_tokenizer, opt["max_len"], pad=True, pair=False,
+                             native_tokenizer=opt["native_tokenizer"])
     dataloader = torch.utils.data.DataLoader(dataset, batch_size=2, num_workers=0)
 
     model.eval()
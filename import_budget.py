@@ -0,0 +1,86 @@
+#  entry point import 시간 측정
+#  각 module 을 새 python process 에서 import 하여 소요 시간과 함께 불러와진 무거운 framework 를 확인한다.
+#  budget 을 넘거나 불러오면 안 되는 framework 가 import 되면 종료 코드 1 을 반환한다.
+#
+#  실행 예시: python import_budget.py --repeat 5
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ["torch", "transformers", "gluonnlp", "mxnet", "onnxruntime", "scrapy", "twisted", "requests"]
+
+# module: (budget (초), import 되면 안 되는 module)
+IMPORT_BUDGET = {
+    "prototype": (0.5, ["torch", "transformers", "gluonnlp", "mxnet", "scrapy", "twisted"]),
+    "server": (0.5, ["torch", "transformers", "gluonnlp", "mxnet", "scrapy", "twisted"]),
+    "model": (4.0, ["transformers", "gluonnlp", "mxnet", "onnxruntime", "scrapy"]),
+    "corpus_cache": (4.0, ["transformers", "gluonnlp", "mxnet", "onnxruntime", "scrapy"]),
+    "trainer": (4.0, ["transformers", "gluonnlp", "mxnet", "onnxruntime", "scrapy"]),
+    "kobert.utils": (0.1, ["requests", "torch"]),
+    "crawler.utils": (0.2, ["scrapy", "twisted", "torch"]),
+    "crawler.spiders.reviewbot": (2.0, ["torch", "transformers", "gluonnlp"]),
+}
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, repeat=3):
+    """
+        새 process 에서 module 을 repeat 번 import 하여 (최소 소요 시간, 불러와진 무거운 module 목록) 반환
+    """
+    elapsed = []
+    loaded = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+        if proc.returncode != 0:
+            raise ImportError(proc.stderr.decode("utf-8", "replace").strip().splitlines()[-1])
+        result = json.loads(proc.stdout.decode("utf-8").strip().splitlines()[-1])
+        elapsed.append(result["elapsed"])
+        loaded = result["loaded"]
+
+    return min(elapsed), loaded
+
+
+def check(modules=None, repeat=3):
+    ok = True
+    for module in modules or IMPORT_BUDGET:
+        budget, forbidden = IMPORT_BUDGET[module]
+        try:
+            elapsed, loaded = measure(module, repeat)
+        except ImportError as e:
+            print("{:<28} error: {}".format(module, e))
+            ok = False
+            continue
+
+        violation = [m for m in loaded if m in forbidden]
+        passed = elapsed <= budget and not violation
+        print("{:<28} {:6.3f}s / {:0.1f}s  loaded: [{}]{}".format(
+            module, elapsed, budget, ", ".join(loaded),
+            "" if passed else "  <- FAIL" + (" (imports {})".format(", ".join(violation)) if violation else "")))
+        ok = ok and passed
+
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="import time budget check")
+    parser.add_argument("modules", nargs="*", help="module 목록 (기본값: 전체)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sys.exit(0 if check(args.modules, args.repeat) else 1)
+
+
+if __name__ == '__main__':
+    main()
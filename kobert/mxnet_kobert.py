@@ -32,19 +32,22 @@ def get_mxnet_kobert_model(use_pooler=True,
                            use_decoder=True,
                            use_classifier=True,
                            ctx=mx.cpu(0),
-                           cachedir='~/kobert/'):
+                           cachedir='~/kobert/',
+                           verify=False):
     # download model
     model_info = mxnet_kobert
     model_path = _download(model_info['url'],
                            model_info['fname'],
                            model_info['chksum'],
-                           cachedir=cachedir)
+                           cachedir=cachedir,
+                           verify=verify)
     # download vocab
     vocab_info = tokenizer
     vocab_path = _download(vocab_info['url'],
                            vocab_info['fname'],
                            vocab_info['chksum'],
-                           cachedir=cachedir)
+                           cachedir=cachedir,
+                           verify=verify)
     return get_kobert_model(model_path, vocab_path, use_pooler, use_decoder,
                             use_classifier, ctx)
 
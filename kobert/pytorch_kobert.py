@@ -48,19 +48,21 @@ bert_config = {
 }
 
 
-def get_pytorch_kobert_model(ctx='cpu', cachedir='~/kobert/'):
+def get_pytorch_kobert_model(ctx='cpu', cachedir='~/kobert/', verify=False):
     # download model
     model_info = pytorch_kobert
     model_path = _download(model_info['url'],
                            model_info['fname'],
                            model_info['chksum'],
-                           cachedir=cachedir)
+                           cachedir=cachedir,
+                           verify=verify)
     # download vocab
     vocab_info = tokenizer
     vocab_path = _download(vocab_info['url'],
                            vocab_info['fname'],
                            vocab_info['chksum'],
-                           cachedir=cachedir)
+                           cachedir=cachedir,
+                           verify=verify)
     return get_kobert_model(model_path, vocab_path, ctx)
 
 
@@ -15,7 +15,7 @@
 
 import os
 import sys
-import requests
+import json
 import hashlib
 
 onnx_kobert = {
@@ -25,6 +25,8 @@ onnx_kobert = {
     'chksum': '44529811f0'
 }
 
+MANIFEST_NAME = '.manifest.json'
+
 tokenizer = {
     'url':
     'https://kobert.blob.core.windows.net/models/kobert/tokenizer/kobert_news_wiki_ko_cased-ae5711deb3.spiece',
@@ -33,15 +35,69 @@ tokenizer = {
 }
 
 
-def download(url, filename, chksum, cachedir='~/kobert/'):
+def _md5sum(file_path, chunk_size=1024 * 1024):
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def _load_manifest(f_cachedir):
+    manifest_path = os.path.join(f_cachedir, MANIFEST_NAME)
+    try:
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+
+def _is_verified(file_path, chksum, manifest):
+    """Check the manifest entry recorded after the last full verification
+    """
+    entry = manifest.get(os.path.basename(file_path))
+    if entry is None:
+        return False
+    stat = os.stat(file_path)
+    return entry.get('chksum') == chksum and entry.get('size') == stat.st_size \
+        and entry.get('mtime_ns') == stat.st_mtime_ns
+
+
+def _record_verified(f_cachedir, file_path, chksum):
+    manifest = _load_manifest(f_cachedir)
+    stat = os.stat(file_path)
+    manifest[os.path.basename(file_path)] = {
+        'chksum': chksum,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+
+    manifest_path = os.path.join(f_cachedir, MANIFEST_NAME)
+    tmp_path = '{}.{}'.format(manifest_path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def download(url, filename, chksum, cachedir='~/kobert/', verify=False):
+    """Download file into cachedir and return its path
+
+    A cached file whose size and mtime match the verified-artifact manifest
+    is trusted without hashing. verify=True forces a full re-hash.
+    """
     f_cachedir = os.path.expanduser(cachedir)
     os.makedirs(f_cachedir, exist_ok=True)
     file_path = os.path.join(f_cachedir, filename)
     if os.path.isfile(file_path):
-        if hashlib.md5(open(file_path,
-                            'rb').read()).hexdigest()[:10] == chksum:
+        if not verify and _is_verified(file_path, chksum, _load_manifest(f_cachedir)):
+            print('using cached model')
+            return file_path
+        if _md5sum(file_path)[:10] == chksum:
+            _record_verified(f_cachedir, file_path, chksum)
             print('using cached model')
             return file_path
+    import requests
+
     with open(file_path, 'wb') as f:
         response = requests.get(url, stream=True)
         total = response.headers.get('content-length')
@@ -60,26 +116,58 @@ def download(url, filename, chksum, cachedir='~/kobert/'):
                                                    '.' * (50 - done)))
                 sys.stdout.flush()
     sys.stdout.write('\n')
-    assert chksum == hashlib.md5(open(
-        file_path, 'rb').read()).hexdigest()[:10], 'corrupted file!'
+    assert chksum == _md5sum(file_path)[:10], 'corrupted file!'
+    _record_verified(f_cachedir, file_path, chksum)
     return file_path
 
 
-def get_onnx(cachedir='~/kobert/'):
+def get_onnx(cachedir='~/kobert/', verify=False):
     """Get 21 ONNX file path after downloading
     """
     model_info = onnx_kobert
     return download(model_info['url'],
                     model_info['fname'],
                     model_info['chksum'],
-                    cachedir=cachedir)
+                    cachedir=cachedir,
+                    verify=verify)
 
 
-def get_tokenizer(cachedir='~/kobert/'):
+def get_tokenizer(cachedir='~/kobert/', verify=False):
     """Get 21 Tokenizer file path after downloading
     """
     model_info = tokenizer
     return download(model_info['url'],
                     model_info['fname'],
                     model_info['chksum'],
-                    cachedir=cachedir)
+                    cachedir=cachedir,
+                    verify=verify)
+
+
+def verify_cache(cachedir='~/kobert/'):
+    """Fully re-hash every cached artifact listed in the manifest
+    """
+    f_cachedir = os.path.expanduser(cachedir)
+    manifest = _load_manifest(f_cachedir)
+    ok = True
+    for filename, entry in sorted(manifest.items()):
+        file_path = os.path.join(f_cachedir, filename)
+        valid = os.path.isfile(file_path) and _md5sum(file_path)[:10] == entry['chksum']
+        if valid:
+            _record_verified(f_cachedir, file_path, entry['chksum'])
+        print('{}: {}'.format(filename, 'ok' if valid else 'corrupted'))
+        ok = ok and valid
+    return ok
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='KoBERT artifact cache')
+    parser.add_argument('--cachedir', default='~/kobert/')
+    parser.add_argument('--verify', action='store_true',
+                        help='force a full re-hash of every cached artifact')
+    args = parser.parse_args()
+
+    if not args.verify:
+        parser.error('nothing to do, pass --verify to re-hash the cached artifacts')
+    sys.exit(0 if verify_cache(args.cachedir) else 1)
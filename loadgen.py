@@ -0,0 +1,106 @@
+#  server.py 부하 테스트
+#  여러 keep-alive 연결로 동시에 요청을 보내 처리량(requests/s)과 latency 분포(p50/p90/p99)를 측정한다.
+#
+#  실행 예시: python loadgen.py --url http://localhost:5000/absa --concurrency 64 --requests 5000
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import urllib.parse
+
+SAMPLE_CORPUS = [
+    "배우들 연기가 정말 좋았고 스토리도 탄탄했어요",
+    "음악은 좋은데 전개가 너무 느려서 지루했다",
+    "액션 장면 스케일이 엄청나네요",
+    "연출이 아쉽지만 반전은 괜찮았음",
+    "감정선이 잘 살아있는 영화",
+    "캐스팅 미스 시나리오도 엉망",
+    "그냥 그랬어요",
+    "최고의 영화 두 번 봤습니다",
+]
+
+
+async def _request(reader, writer, host, path, body):
+    writer.write(("POST {} HTTP/1.1\r\n"
+                  "Host: {}\r\n"
+                  "Content-Type: application/json\r\n"
+                  "Content-Length: {}\r\n\r\n").format(path, host, len(body)).encode("latin-1") + body)
+    await writer.drain()
+
+    status = int((await reader.readline()).decode("latin-1").split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value.strip())
+    await reader.readexactly(length)
+    return status
+
+
+async def _client(url, corpus, texts_per_request, counter, latency, status_count):
+    host, port = url.hostname, url.port or 80
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while counter[0] > 0:
+            counter[0] -= 1
+            texts = random.sample(corpus, min(texts_per_request, len(corpus)))
+            body = json.dumps({"texts": texts}, ensure_ascii=False).encode("utf-8")
+
+            start = time.perf_counter()
+            status = await _request(reader, writer, host, url.path, body)
+            latency.append(time.perf_counter() - start)
+            status_count[status] = status_count.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+async def run(url, concurrency, requests, texts_per_request, corpus):
+    counter = [requests]
+    latency = []
+    status_count = {}
+
+    start = time.perf_counter()
+    await asyncio.gather(*[_client(url, corpus, texts_per_request, counter, latency, status_count)
+                           for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    latency.sort()
+    print("### {} requests, concurrency {}, {} texts/request".format(len(latency), concurrency, texts_per_request))
+    print("elapsed: {:0.2f}s, throughput: {:0.1f} requests/s".format(elapsed, len(latency) / elapsed))
+    print("latency p50: {:0.1f}ms, p90: {:0.1f}ms, p99: {:0.1f}ms, max: {:0.1f}ms".format(
+        _percentile(latency, 50) * 1000, _percentile(latency, 90) * 1000,
+        _percentile(latency, 99) * 1000, latency[-1] * 1000 if latency else float("nan")))
+    print("status: {}".format(", ".join("{}={}".format(k, v) for k, v in sorted(status_count.items()))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="load generator for server.py")
+    parser.add_argument("--url", default="http://localhost:5000/sa")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--texts-per-request", type=int, default=1)
+    parser.add_argument("--corpus", default=None, help="text file, one review per line")
+    args = parser.parse_args()
+
+    corpus = SAMPLE_CORPUS
+    if args.corpus:
+        with open(args.corpus, 'r', encoding='utf-8') as f:
+            corpus = [line.strip() for line in f if line.strip()]
+
+    asyncio.run(run(urllib.parse.urlparse(args.url), args.concurrency, args.requests,
+                    args.texts_per_request, corpus))
+
+
+if __name__ == '__main__':
+    main()
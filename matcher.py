@@ -0,0 +1,134 @@
+#  Aho-Corasick 기반 aspect 검색
+#  aspect 유사 단어 사전으로 automaton 을 한 번 생성하고, 리뷰마다 한 번의 scan 으로 모든 aspect 위치를 찾는다.
+
+import collections
+import functools
+
+
+class AspectMatcher:
+    """
+        aspect 유사 단어 목록(aspect_set)으로 생성한 Aho-Corasick automaton
+
+        aspect_set: list of synonym list - ex) [["연기", "연극"], ["배우", "캐스팅", "모델"], ...]
+        검색 결과는 (start, end, aspect index) 형태이며, corpus[start:end] 가 검색된 단어이다.
+    """
+    def __init__(self, aspect_set):
+        self.aspect_count = len(aspect_set)
+
+        # state 0: root
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]  # (word length, aspect index)
+
+        for aspect_idx, aspect_list in enumerate(aspect_set):
+            for word in aspect_list:
+                if word:
+                    self._add_word(word, aspect_idx)
+        self._build_fail()
+
+    def _add_word(self, word, aspect_idx):
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+
+        if (len(word), aspect_idx) not in self._output[state]:
+            self._output[state].append((len(word), aspect_idx))
+
+    def _build_fail(self):
+        # BFS 순서로 failure link 생성
+        queue = collections.deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find(self, corpus):
+        """
+            corpus 에서 검색된 모든 단어 위치 (겹치는 결과 포함)
+        """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+
+        hits = []
+        state = 0
+        for pos, char in enumerate(corpus):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, aspect_idx in output[state]:
+                hits.append((pos - length + 1, pos + 1, aspect_idx))
+
+        return hits
+
+    def spans(self, corpus, aspects=None, hits=None):
+        """
+            겹치지 않는 검색 결과 (왼쪽 우선, 같은 위치에서는 긴 단어 우선)
+
+            ##### parms info #####
+            aspects: 치환할 aspect index 목록 (None 이면 전체), 다른 aspect 의 단어와 겹쳐도 이 aspect 들의 단어만 비교한다
+            hits: 이미 계산한 find(corpus) 결과 (None 이면 새로 검색)
+
+            치환할 위치를 정할 때만 사용한다. 겹치는 단어는 하나만 남으므로 포함된 aspect 목록은 find / contains 로 구한다.
+        """
+        if hits is None:
+            hits = self.find(corpus)
+        if aspects is not None:
+            hits = [hit for hit in hits if hit[2] in aspects]
+
+        spans = []
+        last_end = 0
+        for start, end, aspect_idx in sorted(hits, key=lambda hit: (hit[0], -hit[1])):
+            if start >= last_end:
+                spans.append((start, end, aspect_idx))
+                last_end = end
+        return spans
+
+    def contains(self, corpus):
+        """
+            aspect 별 포함 여부 (list of bool)
+        """
+        found = [False] * self.aspect_count
+        for _, _, aspect_idx in self.find(corpus):
+            found[aspect_idx] = True
+        return found
+
+    @staticmethod
+    def replace(corpus, spans, replacement):
+        """
+            spans 중 replacement(aspect index -> 치환 문자열)에 포함된 aspect 의 단어를 치환
+        """
+        pieces = []
+        last_end = 0
+        for start, end, aspect_idx in spans:
+            if aspect_idx in replacement:
+                pieces.append(corpus[last_end:start])
+                pieces.append(replacement[aspect_idx])
+                last_end = end
+        pieces.append(corpus[last_end:])
+        return "".join(pieces)
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_matcher(aspect_set):
+    return AspectMatcher(aspect_set)
+
+
+def get_matcher(aspect_set):
+    """
+        aspect_set 별로 생성된 AspectMatcher 를 재사용한다
+    """
+    return _cached_matcher(tuple(tuple(aspect_list) for aspect_list in aspect_set))
@@ -1,13 +1,16 @@
-import kobert.pytorch_kobert
 import kobert.utils
 
 import torch
-import gluonnlp as nlp
-from gluonnlp.data import TSVDataset
 import numpy as np
 
 import os
+import math
+import contextlib
+import time
 import logging
+import functools
+import itertools
+import multiprocessing
 
 DEFAULT_OPTION = {
     "batch_size": 8,
@@ -15,6 +18,9 @@ DEFAULT_OPTION = {
 
     # Pre-Processing
     "max_len": 64,
+    "tokenize_workers": 0,
+    "tokenize_chunk_size": 2048,
+    "native_tokenizer": True,
 
     # Training
     "learning_rate": 5e-5,
@@ -27,19 +33,99 @@ DEFAULT_OPTION = {
     # Print
     "log_interval": 100,
 
+    # Trainer (interval 은 batch 단위, 0 이면 사용하지 않음)
+    "seed": 3,
+    "loader_workers": 0,
+    "pin_memory": False,
+    "checkpoint_interval": 1000,
+    "eval_interval": 0,  # 0 이면 epoch 마다 평가
+    "eval_samples": 0,  # 평가에 사용할 test sample 수, 0 이면 전체
+    "early_stopping_patience": 0,
+
     # ABSA Option
     "object_text_0": "대상",
     "object_text_1": "측면",
-    "ABSA_drop_out_rate": 0.5
+    "ABSA_drop_out_rate": 0.5,
+
+    # Inference
+    "dynamic_padding": True,
+    "stream_chunk_size": 1024,
+
+    # Precision (BERT encoder 를 bfloat16 autocast 로 실행, classifier head 와 loss 는 fp32)
+    "bf16": False
 }
 
 
+_worker_transform = None
+
+
+def _init_tokenize_worker(vocab, max_len, pad, pair, native_tokenizer):
+    # 각 worker process 는 자신의 tokenizer 를 생성한다
+    global _worker_transform
+    _worker_transform = get_sentence_transform(vocab, max_len, pad, pair, native_tokenizer=native_tokenizer)
+
+
+def _tokenize_chunk(sentence_list):
+    return _worker_transform(sentence_list)
+
+
+def get_sentence_transform(vocab, max_len, pad=True, pair=False, bert_tokenizer=None, native_tokenizer=True,
+                           sp_path=None):
+    """
+        list of string -> list of (token_ids, valid_length, segment_ids) 함수 반환
+
+        native_tokenizer=True 이고 pad=True, pair=False 이면 sp_tokenizer.BatchSPTokenizer 를 사용하고,
+        그 외에는 gluonnlp BERTSentenceTransform 을 문장마다 적용한다. 두 결과는 동일하다.
+    """
+    if native_tokenizer and pad and not pair:
+        import sp_tokenizer
+
+        return sp_tokenizer.get_batch_tokenizer(vocab, max_len, sp_path=sp_path).transform
+
+    import gluonnlp as nlp
+
+    if bert_tokenizer is None:
+        bert_tokenizer = get_bert_tokenizer(vocab)
+    transform = nlp.data.BERTSentenceTransform(bert_tokenizer, max_seq_length=max_len, pad=pad, pair=pair)
+    return lambda sentence_list: [transform([sentence]) for sentence in sentence_list]
+
+
+def parallel_tokenize(sentence_list, vocab, max_len, pad, pair, num_workers, chunk_size=2048, native_tokenizer=True):
+    """
+        process pool 을 이용하여 말뭉치를 tokenization 한다
+
+        ##### parms info #####
+        sentence_list: list type - string set
+        vocab: KO-BERT vocab (각 worker 에서 tokenizer 를 다시 생성하는 데 사용)
+        num_workers: worker process 개수
+        chunk_size: worker 에 한 번에 전달하는 문장 개수
+        native_tokenizer: sp_tokenizer.BatchSPTokenizer 사용 여부 (False 이면 gluonnlp)
+
+        결과는 입력 순서와 동일하다.
+    """
+    chunks = [sentence_list[i:i + chunk_size] for i in range(0, len(sentence_list), chunk_size)]
+
+    sentence = []
+    with multiprocessing.Pool(num_workers, initializer=_init_tokenize_worker,
+                              initargs=(vocab, max_len, pad, pair, native_tokenizer)) as pool:
+        for result in pool.imap(_tokenize_chunk, chunks):
+            sentence.extend(result)
+
+    return sentence
+
+
 class BERTDataset(torch.utils.data.Dataset):
-    def __init__(self, dataset, sentence_idx, label_idx, bert_tokenizer, max_len, pad, pair):
+    def __init__(self, dataset, sentence_idx, label_idx, bert_tokenizer, max_len, pad, pair,
+                 num_workers=0, chunk_size=2048, native_tokenizer=True):
         # Tokenization 수행
-        transform = nlp.data.BERTSentenceTransform(
-            bert_tokenizer, max_seq_length=max_len, pad=pad, pair=pair)
-        self.sentence = [transform([record[sentence_idx]]) for record in dataset]
+        if num_workers > 1:
+            sentence_list = [record[sentence_idx] for record in dataset]
+            self.sentence = parallel_tokenize(sentence_list, bert_tokenizer.vocab, max_len, pad, pair,
+                                              num_workers, chunk_size, native_tokenizer)
+        else:
+            transform = get_sentence_transform(bert_tokenizer.vocab, max_len, pad, pair, bert_tokenizer,
+                                               native_tokenizer)
+            self.sentence = transform([record[sentence_idx] for record in dataset])
         self.labels = [np.array(record[label_idx], dtype=np.int32) for record in dataset]
 
     def __getitem__(self, i):
@@ -49,6 +135,153 @@ class BERTDataset(torch.utils.data.Dataset):
         return len(self.labels)
 
 
+class ColumnarBERTDataset(torch.utils.data.Dataset):
+    """
+        column 단위로 저장된 BERT dataset
+
+        token_ids: (N, max_len) int32 matrix
+        valid_length: (N,) int16 vector
+        labels: (N,) 또는 (N, k) int32 array, 없으면 None
+        segment_ids: 단일 문장(pair=False)의 경우 모두 0 이므로 저장하지 않는다. (None)
+
+        index 목록(batch)을 전달하면 batch 전체를 한 번에 반환한다. 연속된 index 는 복사 없이 view 로 반환한다.
+    """
+    def __init__(self, token_ids, valid_length, labels=None, segment_ids=None):
+        self.token_ids = token_ids
+        self.valid_length = valid_length
+        self.labels = labels
+        self.segment_ids = segment_ids
+
+    @classmethod
+    def from_sentence_info(cls, sentence_info, labels=None):
+        """
+            BERTSentenceTransform 결과 목록(sentence_info)으로부터 dataset 생성
+        """
+        max_len = len(sentence_info[0][0]) if len(sentence_info) > 0 else 0
+        token_ids = np.zeros((len(sentence_info), max_len), dtype=np.int32)
+        valid_length = np.zeros(len(sentence_info), dtype=np.int16)
+        for i, sentence in enumerate(sentence_info):
+            token_ids[i] = sentence[0]
+            valid_length[i] = sentence[1]
+
+        if labels is not None:
+            labels = np.array(labels, dtype=np.int32)
+
+        return cls(token_ids, valid_length, labels)
+
+    @classmethod
+    def from_records(cls, dataset, sentence_idx, label_idx, bert_tokenizer, max_len, num_workers=0, chunk_size=2048,
+                     native_tokenizer=True):
+        """
+            BERTDataset 과 동일한 입력으로 dataset 생성
+        """
+        if num_workers > 1:
+            sentence_list = [record[sentence_idx] for record in dataset]
+            sentence_info = parallel_tokenize(sentence_list, bert_tokenizer.vocab, max_len, True, False,
+                                              num_workers, chunk_size, native_tokenizer)
+        elif not native_tokenizer:
+            transform = get_sentence_transform(bert_tokenizer.vocab, max_len, bert_tokenizer=bert_tokenizer,
+                                               native_tokenizer=False)
+            sentence_info = transform([record[sentence_idx] for record in dataset])
+        else:
+            import sp_tokenizer
+
+            # batch tokenizer 결과를 column 에 바로 기록
+            batch_tokenizer = sp_tokenizer.get_batch_tokenizer(bert_tokenizer.vocab, max_len)
+            sentence_list = [record[sentence_idx] for record in dataset]
+            token_ids = np.zeros((len(sentence_list), max_len), dtype=np.int32)
+            valid_length = np.zeros(len(sentence_list), dtype=np.int16)
+            for i in range(0, len(sentence_list), chunk_size):
+                token_ids[i:i + chunk_size], valid_length[i:i + chunk_size], _ = \
+                    batch_tokenizer(sentence_list[i:i + chunk_size])
+
+            return cls(token_ids, valid_length, np.array([record[label_idx] for record in dataset], dtype=np.int32))
+
+        return cls.from_sentence_info(sentence_info, [record[label_idx] for record in dataset])
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            # BERTDataset 과 동일한 형태 (token_ids, valid_length, segment_ids, label)
+            token_ids = self.token_ids[index]
+            segment_ids = self.segment_ids[index] if self.segment_ids is not None else np.zeros_like(token_ids)
+            label = self.labels[index] if self.labels is not None else np.array(0, dtype=np.int32)
+            return token_ids, np.array(self.valid_length[index], dtype=np.int32), segment_ids, label
+
+        # 연속된 index 는 slice 로 변환 (zero-copy view)
+        index = np.asarray(index)
+        if index.shape[0] > 0 and index[-1] - index[0] + 1 == index.shape[0] and np.all(np.diff(index) == 1):
+            index = slice(int(index[0]), int(index[-1]) + 1)
+
+        token_ids = self.token_ids[index]
+        valid_length = self.valid_length[index]
+        segment_ids = self.segment_ids[index] if self.segment_ids is not None else None
+        labels = self.labels[index] if self.labels is not None else None
+        return token_ids, valid_length, segment_ids, labels
+
+    def __len__(self):
+        return self.token_ids.shape[0]
+
+
+def columnar_collate(batch, dynamic_padding=True):
+    """
+        ColumnarBERTDataset batch 를 tensor 로 변환
+
+        numpy view 를 torch.from_numpy 로 복사 없이 변환한다.
+        dynamic_padding 이 켜져 있으면 batch 내 가장 긴 문장 길이에 맞추어 padding 을 잘라낸다.
+    """
+    token_ids, valid_length, segment_ids, labels = batch
+
+    if dynamic_padding:
+        seq_len = int(valid_length.max())
+        token_ids = token_ids[:, :seq_len]
+        segment_ids = segment_ids[:, :seq_len] if segment_ids is not None else None
+
+    token_ids = torch.from_numpy(token_ids)
+    valid_length = torch.from_numpy(valid_length)
+    segment_ids = torch.from_numpy(segment_ids) if segment_ids is not None else torch.zeros_like(token_ids)
+    labels = torch.from_numpy(labels) if labels is not None else None
+
+    return token_ids, valid_length, segment_ids, labels
+
+
+def get_columnar_dataloader(dataset, batch_size, shuffle=False, num_workers=0, dynamic_padding=True, batches=None,
+                            pin_memory=False):
+    """
+        ColumnarBERTDataset 용 DataLoader
+
+        sample 단위가 아닌 batch 단위로 dataset 을 읽는다.
+        batches 가 주어지면 해당 index 목록(또는 batch sampler) 순서대로 batch 를 구성한다.
+    """
+    if batches is None:
+        sampler = torch.utils.data.RandomSampler(dataset) if shuffle else torch.utils.data.SequentialSampler(dataset)
+        batches = torch.utils.data.BatchSampler(sampler, batch_size, drop_last=False)
+
+    return torch.utils.data.DataLoader(dataset, sampler=batches, batch_size=None, num_workers=num_workers,
+                                       pin_memory=pin_memory,
+                                       collate_fn=functools.partial(columnar_collate, dynamic_padding=dynamic_padding))
+
+
+def autocast(enabled, device_type="cpu"):
+    """
+        bfloat16 autocast context
+
+        enabled 가 False 이거나 torch 가 autocast 를 지원하지 않으면 fp32 로 실행한다.
+    """
+    if not enabled:
+        return contextlib.nullcontext()
+    if not hasattr(torch, "autocast"):
+        logging.warning("torch {} does not support bfloat16 autocast, running in fp32".format(torch.__version__))
+        return contextlib.nullcontext()
+    return torch.autocast(device_type=device_type, dtype=torch.bfloat16)
+
+
+def _fp32_region(tensor):
+    # classifier head 구간에서는 autocast 를 끄고 fp32 로 계산한다
+    if hasattr(torch, "autocast"):
+        return torch.autocast(device_type=tensor.device.type, enabled=False)
+    return contextlib.nullcontext()
+
+
 class BERTClassifier(torch.nn.Module):
     def __init__(self,
                  bert,
@@ -69,13 +302,15 @@ class BERTClassifier(torch.nn.Module):
         # bert forward
         _, pooler = self.bert(inputs_embeds=x, token_type_ids=segment_ids.long(),
                               attention_mask=attention_mask)
+        pooler = pooler.float()
 
-        # drop-out layer
-        out = self.dropout(pooler) if self.dr_rate else pooler
+        with _fp32_region(pooler):
+            # drop-out layer
+            out = self.dropout(pooler) if self.dr_rate else pooler
 
-        # softmax output
-        out = self.classifier(out)
-        out = torch.nn.functional.softmax(out, dim=1)
+            # softmax output
+            out = self.classifier(out)
+            out = torch.nn.functional.softmax(out, dim=1)
 
         return out
 
@@ -112,28 +347,123 @@ class ABSAClassifier(torch.nn.Module):
         # bert forward
         _, pooler = self.bert(inputs_embeds=x, token_type_ids=segment_ids.long(),
                               attention_mask=attention_mask)
+        pooler = pooler.float()
 
         out_0 = None
         out_1 = None
         out_2 = None
 
-        if sa:  # sentiment analysis
-            out_0 = self.dropout_0(pooler) if self.dr_rate_0 else pooler
-            out_0 = self.classifier_0(out_0)
-            out_0 = torch.nn.functional.softmax(out_0, dim=1)
+        with _fp32_region(pooler):
+            if sa:  # sentiment analysis
+                out_0 = self.dropout_0(pooler) if self.dr_rate_0 else pooler
+                out_0 = self.classifier_0(out_0)
+                out_0 = torch.nn.functional.softmax(out_0, dim=1)
 
-        if absa:  # aspect-based sentiment analysis
-            out_1 = self.dropout_1(pooler) if self.dr_rate_1 else pooler
-            out_1 = self.classifier_1(out_1)
-            out_1 = torch.nn.functional.softmax(out_1, dim=1)
+            if absa:  # aspect-based sentiment analysis
+                out_1 = self.dropout_1(pooler) if self.dr_rate_1 else pooler
+                out_1 = self.classifier_1(out_1)
+                out_1 = torch.nn.functional.softmax(out_1, dim=1)
 
-            out_2 = self.dropout_2(pooler) if self.dr_rate_1 else pooler
-            out_2 = self.classifier_2(out_2)
-            out_2 = torch.nn.functional.softmax(out_2, dim=1)
+                out_2 = self.dropout_2(pooler) if self.dr_rate_1 else pooler
+                out_2 = self.classifier_2(out_2)
+                out_2 = torch.nn.functional.softmax(out_2, dim=1)
 
         return out_0, out_1, out_2
 
 
+class AspectQueryClassifier(torch.nn.Module):
+    """
+        단일 BERT encoding 으로 모든 aspect 의 감성을 분류하는 classifier
+
+        aspect 단어의 word embedding 평균으로 aspect query vector 를 만들고, query 와 BERT token 출력 사이의
+        attention 으로 aspect 별 문맥 vector 를 구한다. 입력 문장은 aspect 를 치환하지 않고 그대로 사용하므로
+        aspect 개수와 관계없이 문장당 한 번의 encoder 연산만 필요하다.
+
+        ABSA Label: [0:neg, 1:null, 2:pos]
+    """
+    def __init__(self,
+                 bert,
+                 sa_classifier=None,
+                 hidden_size=768,
+                 num_classes=3,
+                 dr_rate_0=None,
+                 dr_rate_1=None,
+                 ):
+        super(AspectQueryClassifier, self).__init__()
+        self.bert = bert
+        self.hidden_size = hidden_size
+        self.num_classes = num_classes
+        self.dr_rate_0 = dr_rate_0
+        self.dr_rate_1 = dr_rate_1
+
+        if sa_classifier:
+            self.classifier_0 = sa_classifier
+        else:
+            self.classifier_0 = torch.nn.Linear(hidden_size, 2)
+        self.query = torch.nn.Linear(hidden_size, hidden_size)
+        self.classifier_1 = torch.nn.Linear(hidden_size, num_classes)
+
+        if dr_rate_0:
+            self.dropout_0 = torch.nn.Dropout(p=dr_rate_0)
+        if dr_rate_1:
+            self.dropout_1 = torch.nn.Dropout(p=dr_rate_1)
+
+    def aspect_query(self, aspect_x, aspect_mask):
+        # aspect_x: A * L * H, aspect_mask: A * L
+        aspect_mask = aspect_mask.unsqueeze(2)
+        query = (aspect_x * aspect_mask).sum(dim=1) / aspect_mask.sum(dim=1).clamp(min=1)
+        return self.query(query)  # A * H
+
+    def forward(self, x, segment_ids, attention_mask, aspect_x, aspect_mask, sa=True):
+        # bert forward
+        sequence, pooler = self.bert(inputs_embeds=x, token_type_ids=segment_ids.long(),
+                                     attention_mask=attention_mask)
+        sequence = sequence.float()
+        pooler = pooler.float()
+
+        with _fp32_region(pooler):
+            out_0 = None
+            if sa:  # sentiment analysis
+                out_0 = self.dropout_0(pooler) if self.dr_rate_0 else pooler
+                out_0 = self.classifier_0(out_0)
+                out_0 = torch.nn.functional.softmax(out_0, dim=1)
+
+            # aspect query attention
+            query = self.aspect_query(aspect_x.float(), aspect_mask)
+            score = torch.einsum("bth,ah->bat", sequence, query) / math.sqrt(self.hidden_size)  # B * A * T
+            score = score.masked_fill(attention_mask.unsqueeze(1) == 0, -1e4)
+            weight = torch.nn.functional.softmax(score, dim=2)
+            context = torch.einsum("bat,bth->bah", weight, sequence)  # B * A * H
+
+            # aspect-based sentiment analysis
+            out_1 = self.dropout_1(context) if self.dr_rate_1 else context
+            out_1 = self.classifier_1(out_1)
+            out_1 = torch.nn.functional.softmax(out_1, dim=2)  # B * A * num_classes
+
+        return out_0, out_1
+
+
+class ABSAExportModule(torch.nn.Module):
+    """
+        embedding lookup, attention mask 생성, BERT encoder, SA/ABSA head 를 하나의 graph 로 묶은 module
+
+        ONNX, TorchScript 로 export 할 때 사용한다. 입력은 token_ids, valid_length 이며
+        단일 문장(pair=False)만 사용하므로 segment_ids 는 내부에서 0 으로 생성한다.
+    """
+    def __init__(self, model):
+        super(ABSAExportModule, self).__init__()
+        self.model = model
+        self.embedding = model.bert.get_input_embeddings()
+
+    def forward(self, token_ids, valid_length):
+        positions = torch.arange(token_ids.shape[1], device=token_ids.device).view(1, -1)
+        attention_mask = (positions < valid_length.view(-1, 1)).float()
+        segment_ids = torch.zeros_like(token_ids)
+
+        x = self.embedding(token_ids)
+        return self.model(x, segment_ids, attention_mask, sa=True, absa=True)
+
+
 def calculate_accuracy(x, y):
     max_vals, max_indices = torch.max(x, 1)
     train_acc = (max_indices == y).sum().data.cpu().numpy() / max_indices.size()[0]
@@ -145,48 +475,104 @@ def softmax_cross_entropy_loss(yhat, y):
     return -(y * logprobs).sum() / yhat.shape[0]
 
 
+def aspect_query_text(aspect):
+    """
+        aspect query 로 입력할 문장 (AspectQueryClassifier 학습 / 추론 공통)
+
+        aspect 가 유사 단어 목록이면 대표 단어 (첫 번째 단어) 를 사용한다.
+        학습 데이터의 aspect 는 단어 하나이므로 추론에서도 같은 형태로 query 를 만든다.
+    """
+    return aspect if isinstance(aspect, str) else aspect[0]
+
+
 def get_bert_tokenizer(vocab):
+    import gluonnlp as nlp
+
     tokenizer = kobert.utils.get_tokenizer()
     bert_tokenizer = nlp.data.BERTSPTokenizer(tokenizer, vocab, lower=False)
 
     return bert_tokenizer
 
 
-def get_bert_dataset(corpus_path, sentence_idx, label_idx, max_len, vocab=None, bert_tokenizer=None):
+def get_bert_dataset(corpus_path, sentence_idx, label_idx, max_len, vocab=None, bert_tokenizer=None,
+                     num_workers=0, chunk_size=2048, columnar=False, native_tokenizer=True):
     if not vocab and not bert_tokenizer:
         # vocab or bert_tokenizer must be required
         return None
 
+    import gluonnlp as nlp
+
     # load train / test dataset
     dataset = nlp.data.TSVDataset(corpus_path, field_indices=[sentence_idx, label_idx], num_discard_samples=1)
 
     # text data pre-processing
     if bert_tokenizer is None:
         bert_tokenizer = get_bert_tokenizer(vocab)
-    bert_dataset = BERTDataset(dataset, 0, 1, bert_tokenizer, max_len, pad=True, pair=False)
+    if columnar:
+        bert_dataset = ColumnarBERTDataset.from_records(dataset, 0, 1, bert_tokenizer, max_len,
+                                                        num_workers=num_workers, chunk_size=chunk_size,
+                                                        native_tokenizer=native_tokenizer)
+    else:
+        bert_dataset = BERTDataset(dataset, 0, 1, bert_tokenizer, max_len, pad=True, pair=False,
+                                   num_workers=num_workers, chunk_size=chunk_size, native_tokenizer=native_tokenizer)
 
     return bert_dataset
 
 
 def gen_attention_mask(token_ids, valid_length):
-    attention_mask = torch.zeros_like(token_ids)
-    for i, v in enumerate(valid_length):
-        attention_mask[i][:v] = 1
-    return attention_mask.float()
+    valid_length = torch.as_tensor(valid_length, device=token_ids.device).view(-1, 1)
+    positions = torch.arange(token_ids.shape[1], device=token_ids.device).view(1, -1)
+    return (positions < valid_length).float()
 
 
-def sentiment_analysis(model_path, corpus_path, sentence_idx, label_idx, opt=DEFAULT_OPTION, ctx="cuda:0", show=False):
+def gen_aspect_mask(token_ids, valid_length):
+    """
+        aspect 단어의 token 위치 mask ([CLS], [SEP], padding 제외)
+    """
+    valid_length = torch.as_tensor(valid_length, device=token_ids.device).view(-1, 1)
+    positions = torch.arange(token_ids.shape[1], device=token_ids.device).view(1, -1)
+    return ((positions > 0) & (positions < valid_length - 1)).float()
+
+
+def length_bucket_batches(valid_length, batch_size, dynamic_padding=True):
+    """
+        batch index 목록 생성
+
+        dynamic_padding 이 켜져 있으면 문장 길이 순서로 정렬하여 비슷한 길이의 문장끼리 batch 를 구성한다.
+        결과는 batch 의 index 를 이용하여 원래 순서로 되돌린다.
+    """
+    if dynamic_padding:
+        order = np.argsort(np.asarray(valid_length), kind="stable")
+    else:
+        order = np.arange(len(valid_length))
+    return [order[i:i + batch_size].tolist() for i in range(0, len(order), batch_size)]
+
+
+def sentiment_analysis(model_path, corpus_path, sentence_idx, label_idx, opt=DEFAULT_OPTION, ctx="cuda:0", show=False,
+                       use_cache=False):
+    import kobert.pytorch_kobert
+
     device = torch.device(ctx)
 
     # load bert model
     bert_model, vocab = kobert.pytorch_kobert.get_pytorch_kobert_model()
 
     # data pre-processing
-    bert_dataset = get_bert_dataset(corpus_path, sentence_idx=sentence_idx, label_idx=label_idx,
-                                    max_len=opt["max_len"], vocab=vocab)
+    if use_cache:
+        import corpus_cache
+        bert_dataset = corpus_cache.get_cached_bert_dataset(corpus_path, sentence_idx=sentence_idx,
+                                                            label_idx=label_idx, max_len=opt["max_len"], vocab=vocab,
+                                                            native_tokenizer=opt["native_tokenizer"])
+    else:
+        bert_dataset = get_bert_dataset(corpus_path, sentence_idx=sentence_idx, label_idx=label_idx,
+                                        max_len=opt["max_len"], vocab=vocab, columnar=True,
+                                        native_tokenizer=opt["native_tokenizer"])
 
     # data loader
-    dataloader = torch.utils.data.DataLoader(bert_dataset, batch_size=opt["batch_size"], num_workers=0)
+    dynamic_padding = opt["dynamic_padding"]
+    batches = length_bucket_batches(bert_dataset.valid_length, opt["batch_size"], dynamic_padding)
+    dataloader = get_columnar_dataloader(bert_dataset, opt["batch_size"], dynamic_padding=dynamic_padding,
+                                         batches=batches)
 
     # load model
     model = BERTClassifier(bert_model).to(device)
@@ -200,6 +586,8 @@ def sentiment_analysis(model_path, corpus_path, sentence_idx, label_idx, opt=DEF
     model.eval()
     with torch.no_grad():
         for batch_id, (token_ids, valid_length, segment_ids, label) in enumerate(dataloader):
+            batch_index = batches[batch_id]
+
             # set test batch
             token_ids = token_ids.long().to(device)
             segment_ids = segment_ids.long().to(device)
@@ -217,9 +605,8 @@ def sentiment_analysis(model_path, corpus_path, sentence_idx, label_idx, opt=DEF
             # test accuracy
             accuracy += calculate_accuracy(out, label)
 
-            ei = si + label.size()[0]
-            result[si:ei, :] = out.cpu().numpy()
-            si = ei
+            result[batch_index, :] = out.cpu().numpy()
+            si = si + label.size()[0]
 
             if show and batch_id % opt["log_interval"] == 0:
                 print("Predict {}%".format(round(si / len(bert_dataset) * 100, 2)))
@@ -228,36 +615,131 @@ def sentiment_analysis(model_path, corpus_path, sentence_idx, label_idx, opt=DEF
     return result, accuracy
 
 
+def iter_chunks(iterable, chunk_size):
+    """
+        iterable 을 chunk_size 크기의 list 로 나누어 반환하는 generator
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_tsv(corpus_path, field_indices, num_discard_samples=1):
+    """
+        TSV 파일을 한 줄씩 읽는 generator (TSVDataset 과 달리 파일 전체를 메모리에 올리지 않는다)
+    """
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        for line_idx, line in enumerate(f):
+            if line_idx < num_discard_samples:
+                continue
+            fields = line.rstrip('\r\n').split('\t')
+            yield [fields[i] for i in field_indices]
+
+
+def sentiment_analysis_iter(model_path, corpus_path, sentence_idx, label_idx, opt=DEFAULT_OPTION, ctx="cuda:0",
+                            chunk_size=None):
+    """
+        sentiment_analysis 의 streaming 버전
+
+        말뭉치를 chunk_size 단위로 읽어 tokenization / 추론을 수행하고, chunk 마다 (result, label) 을 반환한다.
+        말뭉치 크기와 관계없이 메모리 사용량이 일정하다.
+    """
+    import kobert.pytorch_kobert
+
+    device = torch.device(ctx)
+    if chunk_size is None:
+        chunk_size = opt.get("stream_chunk_size", 1024)
+    dynamic_padding = opt["dynamic_padding"]
+
+    # load bert model
+    bert_model, vocab = kobert.pytorch_kobert.get_pytorch_kobert_model()
+    transform = get_sentence_transform(vocab, opt["max_len"], native_tokenizer=opt["native_tokenizer"])
+
+    # load model
+    model = BERTClassifier(bert_model).to(device)
+    model.load_state_dict(torch.load(model_path))
+    word_embedding = model.bert.get_input_embeddings()
+
+    model.eval()
+    with torch.no_grad():
+        for records in iter_chunks(iter_tsv(corpus_path, [sentence_idx, label_idx]), chunk_size):
+            # data pre-processing
+            sentence_info = transform([record[0] for record in records])
+            bert_dataset = ColumnarBERTDataset.from_sentence_info(sentence_info, [record[1] for record in records])
+            batches = length_bucket_batches(bert_dataset.valid_length, opt["batch_size"], dynamic_padding)
+
+            result = np.zeros((len(bert_dataset), 2), dtype=np.float32)
+            for batch_index in batches:
+                token_ids, valid_length, segment_ids, _ = columnar_collate(bert_dataset[batch_index],
+                                                                           dynamic_padding)
+                token_ids = token_ids.long().to(device)
+                segment_ids = segment_ids.long().to(device)
+
+                # forward propagation
+                attention_mask = gen_attention_mask(token_ids, valid_length)
+                x = word_embedding(token_ids)
+                out = model(x, segment_ids, attention_mask)
+
+                result[batch_index, :] = out.cpu().numpy()
+
+            yield result, bert_dataset.labels
+
+
 class ABSAModel:
     """
         사전 학습된 Aspect-Based Sentiment Analysis Model 인터페이스
 
         ABSA Model 을 파일로부터 불러올 수 있다.
+        backend: "torch" (PyTorch eager), "onnx" (ONNX Runtime, CPU 추론용)
+                 또는 "script" (TorchScript artifact, transformers.BertModel 없이 실행)
+        quantize: BERT encoder 및 classifier 의 linear layer 에 int8 dynamic quantization 적용 (CPU 전용)
+        head: "pair" (ABSAClassifier, aspect 2개씩 mask 치환) 또는 "query" (AspectQueryClassifier, 모든 aspect 를 한 번에)
+        bf16: BERT encoder 를 bfloat16 autocast 로 실행 (torch backend 전용, None 이면 DEFAULT_OPTION["bf16"])
 
     """
-    def __init__(self, ctx="cuda:0"):
+    BACKENDS = ["torch", "onnx", "script"]
+    PARITY_SAMPLE = ["영화 정말 재미있어요", "배우 연기는 좋았지만 스토리가 너무 지루했다", "별로"]
+
+    def __init__(self, ctx="cuda:0", backend="torch", quantize=False, head="pair", bf16=None):
         self._state = False
 
         # ABSA model
         self.model = None
         self.device = torch.device(ctx)
+        self.backend = backend
+        self.quantize = quantize
+        self.head = head
+        self.session = None
+        self.script_module = None
+        self.model_path = None
+        self.result_store = None
         self.opt = DEFAULT_OPTION.copy()
         self.opt["batch_size"] = 16
+        if bf16 is not None:
+            self.opt["bf16"] = bf16
 
         # KO-BERT model
         self.bert_model = None
         self.vocab = None
         self.bert_embedding = None
         self.bert_tokenizer = None
+        self.sp_path = None
+        self._transform = None
+        self._transform_key = None
 
-    def load_kobert(self):
+    def load_kobert(self, verify=False):
         """
             load KO-BERT model - https://github.com/SKTBrain/KoBERT
 
             KO-BERT 다운로드 시스템을 이용하여 BERT model 을 불러온다.
+            verify=True 이면 manifest 를 무시하고 cache 된 파일의 checksum 을 다시 계산한다.
         """
+        import kobert.pytorch_kobert
 
-        bert_model, vocab = kobert.pytorch_kobert.get_pytorch_kobert_model()
+        bert_model, vocab = kobert.pytorch_kobert.get_pytorch_kobert_model(verify=verify)
         bert_tokenizer = get_bert_tokenizer(vocab)
 
         self.bert_model = bert_model.to(self.device)
@@ -265,6 +747,22 @@ class ABSAModel:
         self.bert_embedding = bert_model.get_input_embeddings().to(self.device)
         self.bert_tokenizer = bert_tokenizer
 
+    def load_vocab(self, vocab_path=None):
+        """
+            load KO-BERT vocab / tokenizer only
+
+            BERT model 없이 tokenizer 만 준비한다. (TorchScript backend 에서 사용)
+        """
+        import gluonnlp as nlp
+
+        if vocab_path is None:
+            vocab_path = kobert.utils.get_tokenizer()
+
+        vocab = nlp.vocab.BERTVocab.from_sentencepiece(vocab_path, padding_token='[PAD]')
+        self.vocab = vocab
+        self.sp_path = vocab_path
+        self.bert_tokenizer = get_bert_tokenizer(vocab)
+
     def load_empty_bert(self, vocab_path=None):
         """
             load empty BERT model
@@ -282,21 +780,222 @@ class ABSAModel:
         if not os.path.isfile(model_path):
             logging.error("Invalid model path")
             return False
+        self.model_path = model_path
+
+        if self.backend == "script":
+            return self.load_script(model_path)
 
         if not self.bert_model:
             logging.error("BERT model needs to be prepared")
             return False
 
+        if self.backend not in self.BACKENDS:
+            logging.error("Invalid backend: {}".format(self.backend))
+            return False
+
+        if self.quantize and (self.device.type != "cpu" or self.backend != "torch"):
+            logging.error("int8 quantization is only supported with torch backend on CPU")
+            return False
+
+        if self.head == "query" and self.backend != "torch":
+            logging.error("aspect query head is only supported with torch backend")
+            return False
+
+        if self.opt["bf16"] and (self.quantize or self.backend != "torch"):
+            logging.error("bfloat16 autocast is only supported with torch backend without quantization")
+            return False
+
         # create classifier
-        model = ABSAClassifier(self.bert_model).to(self.device)
+        if self.head == "query":
+            model = AspectQueryClassifier(self.bert_model).to(self.device)
+        else:
+            model = ABSAClassifier(self.bert_model).to(self.device)
 
         # load model parameter
-        model.load_state_dict(torch.load(model_path, map_location=self.device))
+        if self.quantize:
+            model = self._load_quantized(model, model_path)
+        else:
+            model.load_state_dict(torch.load(model_path, map_location=self.device))
+        model.eval()
 
         # ready to analyze
         self.model = model
         self._state = True
 
+        if self.backend == "onnx":
+            if not self.load_onnx(model_path):
+                self._state = False
+                return False
+
+        return True
+
+    def _load_quantized(self, model, model_path):
+        """
+            int8 dynamic quantization 적용
+
+            변환된 state dict 를 .pt 파일과 같은 경로의 .int8.pt 파일로 저장하고,
+            이후에는 fp32 parameter 를 불러오지 않고 저장된 state dict 를 바로 사용한다.
+        """
+        quantized_path = os.path.splitext(model_path)[0] + ".int8.pt"
+        cached = os.path.isfile(quantized_path) and \
+            os.path.getmtime(quantized_path) >= os.path.getmtime(model_path)
+
+        if not cached:
+            model.load_state_dict(torch.load(model_path, map_location=self.device))
+
+        # BERT 와 classifier 의 torch.nn.Linear 를 int8 로 변환 (self.bert_model 도 함께 변환된다)
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+        if cached:
+            model.load_state_dict(torch.load(quantized_path, map_location=self.device))
+        else:
+            torch.save(model.state_dict(), quantized_path)
+
+        return model
+
+    def export_script(self, script_path):
+        """
+            export ABSA model (mask ~ SA/ABSA head) to frozen TorchScript artifact
+
+            저장된 파일은 load_script 로 transformers.BertModel 생성 없이 불러올 수 있다.
+        """
+        if not self._state or self.model is None:
+            logging.error("ABSA model needs to be loaded")
+            return False
+
+        module = ABSAExportModule(self.model).eval()
+        token_ids = torch.ones((2, self.opt["max_len"]), dtype=torch.long, device=self.device)
+        valid_length = torch.tensor([self.opt["max_len"], 2], dtype=torch.long, device=self.device)
+
+        with torch.no_grad():
+            script_module = torch.jit.trace(module, (token_ids, valid_length), check_trace=False)
+        if hasattr(torch.jit, "freeze"):
+            script_module = torch.jit.freeze(script_module)
+        torch.jit.save(script_module, script_path)
+
+        # 저장된 graph 와 PyTorch 결과 비교
+        self.script_module = torch.jit.load(script_path, map_location=self.device)
+        diff = self.check_parity(self.tokenize(self.PARITY_SAMPLE), backend="script")
+        if diff > 1e-4:
+            logging.warning("TorchScript output differs from PyTorch output (max abs diff: {})".format(diff))
+
+        return True
+
+    def load_script(self, script_path):
+        """
+            load TorchScript artifact (output of export_script)
+        """
+        if not self.bert_tokenizer:
+            logging.error("KO-BERT vocab needs to be prepared")
+            return False
+
+        self.script_module = torch.jit.load(script_path, map_location=self.device)
+        self.script_module.eval()
+
+        # ready to analyze
+        self._state = True
+        return True
+
+    def export_onnx(self, onnx_path):
+        """
+            export ABSA model (embedding ~ SA/ABSA head) to ONNX file
+
+            batch, sequence 축은 dynamic axis 로 지정한다.
+        """
+        module = ABSAExportModule(self.model).eval()
+        token_ids = torch.ones((2, self.opt["max_len"]), dtype=torch.long, device=self.device)
+        valid_length = torch.tensor([self.opt["max_len"], 2], dtype=torch.long, device=self.device)
+
+        with torch.no_grad():
+            torch.onnx.export(module, (token_ids, valid_length), onnx_path,
+                              input_names=["token_ids", "valid_length"],
+                              output_names=["sa", "absa_1", "absa_2"],
+                              dynamic_axes={"token_ids": {0: "batch", 1: "sequence"},
+                                            "valid_length": {0: "batch"},
+                                            "sa": {0: "batch"},
+                                            "absa_1": {0: "batch"},
+                                            "absa_2": {0: "batch"}},
+                              opset_version=11)
+
+    def load_onnx(self, model_path):
+        """
+            load ONNX Runtime inference session
+
+            .pt 파일과 같은 경로의 .onnx 파일을 사용하며, 없거나 .pt 파일보다 오래된 경우 새로 export 한다.
+        """
+        try:
+            import onnxruntime
+        except ImportError:
+            logging.error("onnxruntime is required for ONNX backend")
+            return False
+
+        onnx_path = os.path.splitext(model_path)[0] + ".onnx"
+        exported = False
+        if not os.path.isfile(onnx_path) or os.path.getmtime(onnx_path) < os.path.getmtime(model_path):
+            self.export_onnx(onnx_path)
+            exported = True
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(onnx_path, options)
+
+        # 새로 export 한 경우 PyTorch 결과와 비교
+        if exported:
+            diff = self.check_parity(self.tokenize(self.PARITY_SAMPLE))
+            if diff > 1e-4:
+                logging.warning("ONNX output differs from PyTorch output (max abs diff: {})".format(diff))
+
+        return True
+
+    def check_parity(self, sentence_info, backend=None):
+        """
+            PyTorch 결과와 선택된 backend 결과를 비교하여 최대 절대 오차를 반환
+        """
+        if backend is None:
+            backend = self.backend
+
+        current = self.backend
+        try:
+            self.backend = "torch"
+            expected = self.analyze(sentence_info, sa=True, absa=True)
+            self.backend = backend
+            actual = self.analyze(sentence_info, sa=True, absa=True)
+        finally:
+            self.backend = current
+
+        return max(float(np.max(np.abs(e - a))) for e, a in zip(expected, actual))
+
+    def _forward(self, token_ids, valid_length, segment_ids, sa, absa):
+        """
+            backend 별 forward propagation, numpy array (result_0, result_1, result_2) 반환
+        """
+        if self.backend == "onnx":
+            out_0, out_1, out_2 = self.session.run(None, {"token_ids": token_ids.long().numpy(),
+                                                          "valid_length": valid_length.long().numpy()})
+            return out_0 if sa else None, out_1 if absa else None, out_2 if absa else None
+
+        # create tensor of sentence information
+        token_ids = token_ids.long().to(self.device)
+        segment_ids = segment_ids.long().to(self.device)
+
+        if self.backend == "script":
+            out_0, out_1, out_2 = self.script_module(token_ids, valid_length.long().to(self.device))
+            return (out_0.cpu().numpy() if sa else None,
+                    out_1.cpu().numpy() if absa else None,
+                    out_2.cpu().numpy() if absa else None)
+
+        # get word embedding
+        attention_mask = gen_attention_mask(token_ids, valid_length)
+        x = self.bert_embedding(token_ids)
+
+        # forward propagation
+        with autocast(self.opt["bf16"], self.device.type):
+            out_0, out_1, out_2 = self.model(x, segment_ids, attention_mask, sa=sa, absa=absa)
+
+        return (out_0.cpu().numpy() if sa else None,
+                out_1.cpu().numpy() if absa else None,
+                out_2.cpu().numpy() if absa else None)
+
     def tokenize(self, corpus_list):
         """
             tokenization with sentence-piece tokenizer (KO-BERT)
@@ -308,20 +1007,22 @@ class ABSAModel:
             logging.error("ABSAModel has not been initialized")
             return None
 
-        transform = nlp.data.BERTSentenceTransform(
-            self.bert_tokenizer, max_seq_length=self.opt["max_len"], pad=True, pair=False)
-
-        sentence_info = []
-        for corpus in corpus_list:
-            sentence = transform([corpus])
-            """
-                ##### Transform Result #####
-                sentence[0]: token_ids, numpy array
-                sentence[1]: valid_length, array type scalar
-                sentence[2]: segment_ids, numpy array
-            """
-            sentence_info.append(sentence)
+        # tokenizer 는 vocab / max_len / native_tokenizer 가 바뀔 때만 다시 생성한다
+        transform_key = (id(self.vocab), self.opt["max_len"], self.opt["native_tokenizer"])
+        if self._transform_key != transform_key:
+            self._transform = get_sentence_transform(self.vocab, self.opt["max_len"],
+                                                     bert_tokenizer=self.bert_tokenizer,
+                                                     native_tokenizer=self.opt["native_tokenizer"],
+                                                     sp_path=self.sp_path)
+            self._transform_key = transform_key
 
+        sentence_info = self._transform(corpus_list)
+        """
+            ##### Transform Result #####
+            sentence[0]: token_ids, numpy array
+            sentence[1]: valid_length, array type scalar
+            sentence[2]: segment_ids, numpy array
+        """
         return sentence_info
 
     def word_embedding(self, sentence_info, corpus_list=None):
@@ -355,7 +1056,7 @@ class ABSAModel:
 
         return x
 
-    def analyze(self, sentence_info, sa=True, absa=False, batch_size=None):
+    def analyze(self, sentence_info, sa=True, absa=False, batch_size=None, dynamic_padding=None):
         """
             perform aspect-based sentiment analysis
 
@@ -364,53 +1065,45 @@ class ABSAModel:
             sa: whether to perform sentiment analysis
             absa: whether to perform aspect-based sentiment analysis
             batch_size: evaluation batch size
+            dynamic_padding: sort by length and pad each batch to its own longest sentence
         """
         if not self._state:
             logging.error("ABSAModel has not been initialized")
             return None
 
+        if self.head == "query":
+            logging.error("analyze requires head=\"pair\", use analyze_aspects instead")
+            return None
+
         if batch_size is None:
             batch_size = self.opt["batch_size"]
+        if dynamic_padding is None:
+            dynamic_padding = self.opt["dynamic_padding"]
 
         # create batch loader
         total_count = len(sentence_info)
-        batch_loader = torch.utils.data.DataLoader(sentence_info, batch_size=batch_size, num_workers=0)
+        dataset = ColumnarBERTDataset.from_sentence_info(sentence_info)
+        batches = length_bucket_batches(dataset.valid_length, batch_size, dynamic_padding)
 
         # evaluation
-        model = self.model
-        device = self.device
-
         result_0 = np.zeros((total_count, 2), dtype=float) if sa else None
         result_1 = np.zeros((total_count, 3), dtype=float) if absa else None
         result_2 = np.zeros((total_count, 3), dtype=float) if absa else None
-        index = 0
 
-        model.eval()
         with torch.no_grad():
-            for batch_id, (token_ids, valid_length, segment_ids) in enumerate(batch_loader):
-                batch_count = token_ids.shape[0]
-
-                # create tensor of sentence information
-                token_ids = token_ids.long().to(device)
-                segment_ids = segment_ids.long().to(device)
-                valid_length = valid_length
-
-                # get word embedding
-                attention_mask = gen_attention_mask(token_ids, valid_length)
-                x = self.bert_embedding(token_ids)
+            for batch_index in batches:
+                token_ids, valid_length, segment_ids, _ = columnar_collate(dataset[batch_index], dynamic_padding)
 
                 # forward propagation
-                out_0, out_1, out_2 = model(x, segment_ids, attention_mask, sa=sa, absa=absa)
+                out_0, out_1, out_2 = self._forward(token_ids, valid_length, segment_ids, sa, absa)
 
                 # result
                 if sa:
-                    result_0[index:index+batch_count] = out_0.cpu().numpy()
+                    result_0[batch_index] = out_0
 
                 if absa:
-                    result_1[index:index+batch_count] = out_1.cpu().numpy()
-                    result_2[index:index+batch_count] = out_2.cpu().numpy()
-
-                index = index + batch_count
+                    result_1[batch_index] = out_1
+                    result_2[batch_index] = out_2
 
         """
             ##### Analysis Result #####
@@ -420,14 +1113,195 @@ class ABSAModel:
         """
         return result_0, result_1, result_2
 
+    def set_result_store(self, result_store):
+        """
+            analyze_corpus 결과 저장소 지정 (result_store.ResultStore, None 이면 사용하지 않음)
+
+            checkpoint 의 hash 와 결과에 영향을 주는 설정 (head, backend, quantize, bf16, max_len, object text) 으로
+            model tag 를 만들며, 저장소의 model tag 가 다르면 이전 결과는 무효화된다.
+        """
+        if result_store is not None:
+            if self.model_path is None:
+                logging.error("model needs to be loaded before setting result store")
+                return False
+            model_tag = "{}:{}:{}:{}:{}:{}:{}".format(result_store.checkpoint_hash(self.model_path), self.head,
+                                                   self.backend, self.quantize, self.opt["bf16"], self.opt["max_len"],
+                                                   self.opt["object_text_0"] + self.opt["object_text_1"])
+            result_store.set_model(model_tag)
+
+        self.result_store = result_store
+        return True
+
+    def analyze_corpus(self, corpus_list, sa=True, absa=False, aspect_pairs=None):
+        """
+            tokenize + analyze, result store 에 저장된 문장은 다시 분석하지 않는다
+
+            ##### parms info #####
+            corpus_list: list type - string set
+            aspect_pairs: 문장별 mask 된 aspect 쌍 (ex. masked_corpus_info 의 [aspect 1, aspect 2]), key 에 포함된다
+
+            분석하지 않은 문장은 이후 요청을 위해 SA / ABSA 를 모두 계산하여 저장한다.
+        """
+        if self.result_store is None:
+            return self.analyze(self.tokenize(corpus_list), sa=sa, absa=absa)
+
+        if self.head == "query":
+            logging.error("analyze_corpus requires head=\"pair\"")
+            return None
+
+        store = self.result_store
+        if aspect_pairs is None:
+            aspect_pairs = [None] * len(corpus_list)
+        keys = [store.key(corpus, tuple(pair) if pair is not None else None)
+                for corpus, pair in zip(corpus_list, aspect_pairs)]
+        cached = store.get_many(keys)
+
+        # 저장되지 않은 문장만 분석 (같은 key 는 한 번만)
+        missing = {}
+        for idx, value in enumerate(cached):
+            if value is None and keys[idx] not in missing:
+                missing[keys[idx]] = idx
+        if missing:
+            target = list(missing.values())
+            result = self.analyze(self.tokenize([corpus_list[idx] for idx in target]), sa=True, absa=True)
+            if result is None:
+                return None
+            store.put_many(list(missing.keys()), *result)
+            cached = store.get_many(keys)
 
+        result_0 = np.array([value[0] for value in cached], dtype=float).reshape(-1, 2) if sa else None
+        result_1 = np.array([value[1] for value in cached], dtype=float).reshape(-1, 3) if absa else None
+        result_2 = np.array([value[2] for value in cached], dtype=float).reshape(-1, 3) if absa else None
+        return result_0, result_1, result_2
+
+    def analyze_aspects(self, sentence_info, aspect_list, sa=False, batch_size=None, dynamic_padding=None):
+        """
+            perform aspect-based sentiment analysis for every aspect in a single pass (head="query")
 
+            ##### parms info #####
+            sentence_info: result of tokenized corpus (aspect 를 치환하지 않은 원문)
+            aspect_list: list of aspect, 각 aspect 는 단어(string) 또는 유사 단어 목록(list of string)
+                         query 는 aspect_query_text 로 만든다 (유사 단어 목록이면 대표 단어)
+            sa: whether to perform sentiment analysis
+            batch_size: evaluation batch size
+            dynamic_padding: sort by length and pad each batch to its own longest sentence
+        """
+        if not self._state:
+            logging.error("ABSAModel has not been initialized")
+            return None
 
+        if self.head != "query":
+            logging.error("analyze_aspects requires head=\"query\"")
+            return None
 
+        if batch_size is None:
+            batch_size = self.opt["batch_size"]
+        if dynamic_padding is None:
+            dynamic_padding = self.opt["dynamic_padding"]
 
+        # aspect query (모든 batch 에서 공유)
+        aspect_text = [aspect_query_text(aspect) for aspect in aspect_list]
+        aspect_dataset = ColumnarBERTDataset.from_sentence_info(self.tokenize(aspect_text))
+        aspect_ids, aspect_length, _, _ = columnar_collate(aspect_dataset[np.arange(len(aspect_text))])
+        aspect_ids = aspect_ids.long().to(self.device)
+        aspect_mask = gen_aspect_mask(aspect_ids, aspect_length)
 
+        # create batch loader
+        total_count = len(sentence_info)
+        dataset = ColumnarBERTDataset.from_sentence_info(sentence_info)
+        batches = length_bucket_batches(dataset.valid_length, batch_size, dynamic_padding)
 
+        # evaluation
+        result_0 = np.zeros((total_count, 2), dtype=float) if sa else None
+        result_1 = np.zeros((total_count, len(aspect_list), 3), dtype=float)
 
+        with torch.no_grad():
+            aspect_x = self.bert_embedding(aspect_ids)
 
+            for batch_index in batches:
+                token_ids, valid_length, segment_ids, _ = columnar_collate(dataset[batch_index], dynamic_padding)
 
+                # create tensor of sentence information
+                token_ids = token_ids.long().to(self.device)
+                segment_ids = segment_ids.long().to(self.device)
+
+                # get word embedding
+                attention_mask = gen_attention_mask(token_ids, valid_length)
+                x = self.bert_embedding(token_ids)
+
+                # forward propagation
+                with autocast(self.opt["bf16"], self.device.type):
+                    out_0, out_1 = self.model(x, segment_ids, attention_mask, aspect_x, aspect_mask, sa=sa)
+
+                # result
+                if sa:
+                    result_0[batch_index] = out_0.cpu().numpy()
+                result_1[batch_index] = out_1.cpu().numpy()
+
+        """
+            ##### Analysis Result #####
+            result_0: SA rate
+            result_1: ABSA rate for every aspect (N * aspect * 3)
+        """
+        return result_0, result_1
+
+    def analyze_iter(self, corpus_iter, sa=True, absa=False, chunk_size=None, batch_size=None):
+        """
+            streaming aspect-based sentiment analysis
+
+            ##### parms info #####
+            corpus_iter: iterable of string (file, socket, crawler output ...)
+            sa: whether to perform sentiment analysis
+            absa: whether to perform aspect-based sentiment analysis
+            chunk_size: number of sentences tokenized and analyzed at once
+            batch_size: evaluation batch size
+
+            chunk 단위로 (corpus_list, result_0, result_1, result_2) 를 반환한다.
+        """
+        if not self._state:
+            logging.error("ABSAModel has not been initialized")
+            return
+
+        if self.head == "query":
+            logging.error("analyze_iter requires head=\"pair\", use analyze_aspects instead")
+            return
+
+        if chunk_size is None:
+            chunk_size = self.opt["stream_chunk_size"]
+
+        for corpus_list in iter_chunks(corpus_iter, chunk_size):
+            sentence_info = self.tokenize(corpus_list)
+            result = self.analyze(sentence_info, sa=sa, absa=absa, batch_size=batch_size)
+            if result is None:
+                return
+            yield (corpus_list,) + tuple(result)
+
+    def evaluate(self, corpus_path, sentence_idx, label_idx, limit=None):
+        """
+            TSV 말뭉치에 대한 sentiment analysis 정확도 및 처리 속도 측정
+
+            ##### parms info #####
+            corpus_path: held-out TSV file (label 0: negative, 1: positive)
+            limit: maximum number of sentences
+
+            {"accuracy", "sentences_per_sec", "elapsed", "result"} 를 반환한다.
+        """
+        if not self._state:
+            logging.error("ABSAModel has not been initialized")
+            return None
 
+        records = list(itertools.islice(iter_tsv(corpus_path, [sentence_idx, label_idx]), limit))
+        corpus_list = [record[0] for record in records]
+        label = np.array([record[1] for record in records], dtype=np.int32)
+
+        start = time.time()
+        sentence_info = self.tokenize(corpus_list)
+        result, _, _ = self.analyze(sentence_info, sa=True, absa=False)
+        elapsed = time.time() - start
+
+        return {
+            "accuracy": float(np.mean(np.argmax(result, axis=1) == label)),
+            "sentences_per_sec": len(records) / elapsed,
+            "elapsed": elapsed,
+            "result": result,
+        }
@@ -1,9 +1,10 @@
 #  2020 국어 정보 처리 시스템 경진 대회 출품작
 #  Team 리프: 영화 리뷰 분석 시스템
 
-from model import ABSAModel
-from crawler.utils import MovieCrawler
+from matcher import get_matcher
+import aggregate
 
+import argparse
 import logging
 import numpy as np
 
@@ -19,43 +20,42 @@ SIM_WORD_LIST = [["연기", "연극"],
                  ["규모", "스케일", "크기"]]
 
 ABSA_model_path = "ABSA_model.pt"
+ABSA_query_model_path = "ABSA_query_model.pt"
 daum_movie_url = "https://movie.daum.net/main/new#slide-1-0"
 
 
 def _aspect_mask_to_corpus(corpus_list, opt, aspect_set=SIM_WORD_LIST):
     """
         말뭉치 데이터를 이용하여 ABSA 데이터 생성
+
+        aspect 유사 단어 검색은 Aho-Corasick automaton 으로 리뷰당 한 번만 수행하고,
+        검색된 단어 위치를 mask 로 치환한다.
+        유사 단어가 서로 겹치더라도 (ex. "반전개" 의 반전 / 전개) 검색된 aspect 는 모두 분석 대상이다.
     """
     masked_corpus_list = []
     masked_corpus_info = []
     mask = [opt["object_text_0"], opt["object_text_1"]]
+    matcher = get_matcher(aspect_set)
 
     for corpus_idx, corpus in enumerate(corpus_list):
-        asp = np.zeros((len(aspect_set), 1), dtype=np.int32)
-        for idx, aspect_list in enumerate(aspect_set):
-            for aspect in aspect_list:
-                asp[idx] = corpus.find(aspect)
-                if asp[idx] != -1:
-                    break
-        asp[asp != -1] = 1
-        asp[asp == -1] = 0
-
-        rnd_asp = np.where(asp == 1)[0]
+        hits = matcher.find(corpus)
+        rnd_asp = sorted(set(aspect_idx for _, _, aspect_idx in hits))
         idx = 0
 
         # 홀수개의 aspect 가 존재하는 경우
-        if np.sum(asp) % 2 != 0:
+        if len(rnd_asp) % 2 != 0:
             asp_idx = rnd_asp[idx]
-            masked_corpus_list.append(corpus.replace(MOVIE_ASPECT[asp_idx], mask[0]))
+            replacement = {asp_idx: mask[0]}
+            masked_corpus_list.append(matcher.replace(corpus, matcher.spans(corpus, replacement, hits), replacement))
             masked_corpus_info.append([corpus_idx, asp_idx, -1])
             idx = idx + 1
 
         # 짝수개의 aspect 를 치환
-        while idx < rnd_asp.shape[0]:
+        while idx < len(rnd_asp):
             asp_idx_0 = rnd_asp[idx]
             asp_idx_1 = rnd_asp[idx + 1]
-            replaced_corpus = corpus.replace(MOVIE_ASPECT[asp_idx_0], mask[0])
-            replaced_corpus = replaced_corpus.replace(MOVIE_ASPECT[asp_idx_1], mask[1])
+            replacement = {asp_idx_0: mask[0], asp_idx_1: mask[1]}
+            replaced_corpus = matcher.replace(corpus, matcher.spans(corpus, replacement, hits), replacement)
             masked_corpus_list.append(replaced_corpus)
             masked_corpus_info.append([corpus_idx, asp_idx_0, asp_idx_1])
             idx = idx + 2
@@ -63,11 +63,125 @@ def _aspect_mask_to_corpus(corpus_list, opt, aspect_set=SIM_WORD_LIST):
     return masked_corpus_list, masked_corpus_info
 
 
-def corpus_analysis(ctx="cuda0"):
+def _aspect_hit_matrix(corpus_list, aspect_set=SIM_WORD_LIST):
+    """
+        말뭉치별 aspect 포함 여부 (N * aspect bool 행렬)
+    """
+    matcher = get_matcher(aspect_set)
+    hit = np.zeros((len(corpus_list), len(aspect_set)), dtype=bool)
+    for corpus_idx, corpus in enumerate(corpus_list):
+        hit[corpus_idx] = matcher.contains(corpus)
+    return hit
+
+
+def _review_aspect_matrix(model, corpus_list, aspect_set=SIM_WORD_LIST):
+    """
+        리뷰-측면 행렬 생성
+
+        ABSA Classifier Label: [0:neg, 1:null, 2:pos]
+        Review-Aspect Matrix: [-1:neg, 0:null, 1:pos]
+    """
+    review_matrix = np.zeros((len(corpus_list), len(aspect_set)), dtype=np.int8)
+
+    if model.head == "query":
+        # 리뷰당 한 번의 encoder 연산으로 모든 aspect 를 분석
+        hit = _aspect_hit_matrix(corpus_list, aspect_set)
+        target = np.where(hit.any(axis=1))[0]
+        if target.shape[0] > 0:
+            sentence_info = model.tokenize([corpus_list[idx] for idx in target])
+            _, result = model.analyze_aspects(sentence_info, aspect_set)
+            result = np.argmax(result, axis=2) - 1
+            review_matrix[target] = np.where(hit[target], result, 0)
+        return review_matrix
+
+    # create masked corpus_list
+    masked_corpus_list, masked_corpus_info = _aspect_mask_to_corpus(corpus_list, model.opt, aspect_set=aspect_set)
+    if len(masked_corpus_list) == 0:
+        return review_matrix
+
+    # aspect-based sentiment analysis (result store 에 저장된 문장은 다시 분석하지 않는다)
+    aspect_pairs = [info[1:] for info in masked_corpus_info]
+    _, result_1, result_2 = model.analyze_corpus(masked_corpus_list, sa=False, absa=True, aspect_pairs=aspect_pairs)
+
+    # write review-aspect matrix
+    review_matrix, _ = aggregate.scatter_review_aspect(masked_corpus_info, result_1, result_2,
+                                                       len(corpus_list), len(aspect_set))
+    return review_matrix
+
+
+def _stream_review_aspect_matrix(model, reviews, chunk_size=256, aspect_set=SIM_WORD_LIST):
+    """
+        crawling 중인 리뷰를 chunk 단위로 분석하여 리뷰-측면 행렬 생성
+
+        ##### parms info #####
+        reviews: crawler.sinks.Review / MovieEnd iterator (MovieCrawler.crawl_iter())
+        chunk_size: 한 번에 분석할 리뷰 개수
+
+        crawling 은 reactor thread 에서 계속 진행되므로 crawling 과 분석 시간이 겹친다.
+        chunk 분석이 끝날 때마다 누적 집계 결과를 출력하며, (영화 제목, 리뷰 목록, 리뷰-측면 행렬) 을 반환한다.
+        리뷰는 도착 순서대로 분석하고, 반환할 때는 crawl() 결과와 같도록 page / page 내 순서로 정렬한다.
+    """
+    from crawler.sinks import MovieEnd
+
+    title = ""
+    corpus_list = []
+    position_list = []
+    matrix_list = []
+    running = aggregate.RunningSummary(len(aspect_set))
+
+    def flush(start):
+        if start == len(corpus_list):
+            return
+        review_matrix = _review_aspect_matrix(model, corpus_list[start:], aspect_set=aspect_set)
+        matrix_list.append(review_matrix)
+        running.update(review_matrix)
+        print("\r### 분석한 리뷰 개수: {} (감성 분석 리뷰 개수: {})".format(
+            running.review_count, int(np.sum(running.summary().total_count))), end="", flush=True)
+
+    start = 0
+    for review in reviews:
+        title = title or review.title
+        if isinstance(review, MovieEnd):
+            continue
+        corpus_list.append(review.text)
+        position_list.append((review.page, review.order))
+        if len(corpus_list) - start >= chunk_size:
+            flush(start)
+            start = len(corpus_list)
+    flush(start)
+    print("")
+
+    if matrix_list:
+        review_matrix = np.concatenate(matrix_list, axis=0)
+    else:
+        review_matrix = np.zeros((0, len(aspect_set)), dtype=np.int8)
+
+    order = sorted(range(len(corpus_list)), key=position_list.__getitem__)
+    return title, [corpus_list[idx] for idx in order], review_matrix[order]
+
+
+def _sentiment_text(ratio, count):
+    # 분석된 리뷰가 없으면 ratio 가 nan 이므로 비율 대신 안내 문구 출력
+    if count == 0:
+        return "분석된 리뷰 없음"
+    return f"{'긍정적' if ratio > 0.5 else '부정적'} ({'%0.2f' % (ratio*100 if ratio > 0.5 else (1 - ratio)*100)}%)"
+
+
+def _attach_result_store(model, result_store_path):
+    if result_store_path:
+        from result_store import ResultStore
+
+        model.set_result_store(ResultStore(result_store_path))
+
+
+def corpus_analysis(ctx="cuda0", verify=False, result_store_path=None):
+    from model import ABSAModel
+
     # create ABSA model
     model = ABSAModel(ctx=ctx)
-    model.load_kobert()
+    model.load_kobert(verify=verify)
     model.load_model(ABSA_model_path)
+    _attach_result_store(model, result_store_path)
 
     print("\n##### Aspect-based Sentiment Analysis")
     print("##### 2020-09-14, Team 리프")
@@ -88,8 +202,9 @@ def corpus_analysis(ctx="cuda0"):
 
         if len(masked_corpus_list) > 0:
             # aspect-base sentiment analysis
-            sentence_info = model.tokenize(masked_corpus_list)
-            _, result_1, result_2 = model.analyze(sentence_info, sa=False, absa=True)
+            aspect_pairs = [info[1:] for info in masked_corpus_info]
+            _, result_1, result_2 = model.analyze_corpus(masked_corpus_list, sa=False, absa=True,
+                                                         aspect_pairs=aspect_pairs)
 
             result_label_1 = np.argmax(result_1, axis=1)
             result_label_2 = np.argmax(result_2, axis=1)
@@ -117,14 +232,20 @@ def corpus_analysis(ctx="cuda0"):
         print("\n--------------------------------------")
 
 
-def daum_review_analysis(ctx="cuda:0"):
-    # create movie crawler
-    crawler = MovieCrawler()
+def daum_review_analysis(ctx="cuda:0", single_pass=False, verify=False, result_store_path=None, stream=False,
+                         offline=False):
+    from model import ABSAModel
+    from crawler.utils import MovieCrawler
 
-    # create ABSA model
-    model = ABSAModel(ctx=ctx)
-    model.load_kobert()
-    model.load_model(ABSA_model_path)
+    # create movie crawler (offline: HTTP cache 에 저장된 page 만 사용)
+    crawler = MovieCrawler(offline=offline)
+
+    # create ABSA model (single_pass: 리뷰당 한 번의 encoder 연산으로 모든 aspect 분석)
+    model = ABSAModel(ctx=ctx, head="query" if single_pass else "pair")
+    model.load_kobert(verify=verify)
+    model.load_model(ABSA_query_model_path if single_pass else ABSA_model_path)
+    if not single_pass:
+        _attach_result_store(model, result_store_path)
 
     # input url
     print("\n##### [2020 국어 정보 처리 시스템 경진 대회 출품작]")
@@ -134,53 +255,38 @@ def daum_review_analysis(ctx="cuda:0"):
     print("\nDAUM 영화 홈페이지: {}".format(daum_movie_url))
     url = input("영화 메인 URL 입력: ")
     print("영화 리뷰 데이터를 가져오는 중...")
-    crawl_data = crawler.crawl(url)
-    print("영화 리뷰 데이터 크롤링 성공")
-
-    print("\n### 영화 제목: [ {} ]".format(crawl_data[0]))
-
-    # get corpus list
-    corpus_list = crawl_data[1]
+    if stream:
+        # crawling 과 분석을 동시에 진행 (stream: 리뷰가 도착하는 대로 chunk 단위 분석)
+        title, corpus_list, review_matrix = _stream_review_aspect_matrix(model, crawler.crawl_iter([url]))
+        print("영화 리뷰 데이터 크롤링 및 분석 완료")
 
-    # create masked corpus_list
-    masked_corpus_list, masked_corpus_info = _aspect_mask_to_corpus(corpus_list, model.opt)
+        print("\n### 영화 제목: [ {} ]".format(title))
+    else:
+        crawl_data = crawler.crawl(url)
+        print("영화 리뷰 데이터 크롤링 성공")
 
-    # create review-aspect matrix
-    review_matrix = np.zeros((len(corpus_list), len(MOVIE_ASPECT)), dtype=np.int32)
+        print("\n### 영화 제목: [ {} ]".format(crawl_data[0]))
 
-    # aspect-based sentiment analysis
-    sentence_info = model.tokenize(masked_corpus_list)
-    _, result_1, result_2 = model.analyze(sentence_info, sa=False, absa=True)
-    result_1 = np.argmax(result_1, axis=1)
-    result_2 = np.argmax(result_2, axis=1)
+        # get corpus list
+        corpus_list = crawl_data[1]
 
-    # write review-aspect matrix
-    for idx, (review_idx, aspect_1, aspect_2) in enumerate(masked_corpus_info):
-        # ABSA Classifier Label: [0:neg, 1:null, 2:pos]
-        # Review-Aspect Matrix: [-1:neg, 0:null, 1:pos]
-        if aspect_1 != -1:
-            review_matrix[review_idx][aspect_1] = result_1[idx] - 1
-        if aspect_2 != -1:
-            review_matrix[review_idx][aspect_2] = result_2[idx] - 1
+        # create review-aspect matrix (aspect-based sentiment analysis)
+        review_matrix = _review_aspect_matrix(model, corpus_list)
 
     # aspect-based review analysis
-    total_count = np.abs(review_matrix).sum(axis=0)
-    pos_count = review_matrix.copy()
-    pos_count[pos_count != 1] = 0
-    pos_count = np.count_nonzero(pos_count, axis=0)
-    ratio = pos_count / total_count
+    summary = aggregate.summarize(review_matrix)
+    total_count = summary.total_count
+    ratio = summary.ratio
 
     # review information
     print("### 총 리뷰 개수: {}".format(len(corpus_list)))
     print("### 감성 분석 리뷰 개수: {}".format(np.sum(total_count)))
 
     # Top 3 aspect information
-    asp_rank = np.argsort(total_count)[::-1]
+    asp_rank = aggregate.top_k(total_count, 3)
     print("\n\n### Top 3 Aspect: 영화 리뷰에 가장 많이 발견된 측면에 대하여 감성 분석")
-    for i in range(0, 3):
-        idx = asp_rank[i]
-        print(f"### {i + 1}. {MOVIE_ASPECT[idx]}: {'긍정적' if ratio[idx] > 0.5 else '부정적'} "
-              f"({'%0.2f' % (ratio[idx]*100 if ratio[idx] > 0.5 else (1 - ratio[idx])*100)}%)")
+    for i, idx in enumerate(asp_rank):
+        print(f"### {i + 1}. {MOVIE_ASPECT[idx]}: {_sentiment_text(ratio[idx], total_count[idx])}")
 
     # Target Review
     print("\n\n### Target Review: 관심 있는 측면에 대한 리뷰 분석 결과를 출력")
@@ -211,29 +317,15 @@ def daum_review_analysis(ctx="cuda:0"):
     custom_aspect = input("### 감성 분석 주제 입력: ")
     print(f"### \"{custom_aspect}\" 감성 분석 실행...")
 
-    mcl, mci = _aspect_mask_to_corpus(corpus_list, model.opt, aspect_set=[[custom_aspect]])
-    if len(mcl) > 0:
-        rm = np.zeros((len(corpus_list), 1), dtype=np.int32)
-        si = model.tokenize(mcl)
-        _, r1, r2 = model.analyze(si, sa=False, absa=True)
-        r1 = np.argmax(r1, axis=1)
-        r2 = np.argmax(r2, axis=1)
-        for idx, (review_idx, asp_1, asp_2) in enumerate(mci):
-            if asp_1 != -1:
-                rm[review_idx][asp_1] = r1[idx] - 1
-            if asp_2 != -1:
-                rm[review_idx][asp_2] = r2[idx] - 1
-
-    tc = np.abs(rm).sum(axis=0)[0]
-    pc = rm.copy()
-    pc[pc != 1] = 0
-    pc = np.count_nonzero(pc, axis=0)[0]
-    pr = pc / tc
+    rm = _review_aspect_matrix(model, corpus_list, aspect_set=[[custom_aspect]])
+
+    rs = aggregate.summarize(rm)
+    tc = rs.total_count[0]
+    pr = rs.ratio[0]
 
     print(f"\n### \"{custom_aspect}\" 관련 감성 분석 결과")
     print(f"### 연관 리뷰 개수: {tc}")
-    print(f"### 감성 지표: {'긍정적' if pr > 0.5 else '부정적'}"
-          f" ({'%0.2f' % (pr*100 if pr > 0.5 else (1 - pr)*100)}%)")
+    print(f"### 감성 지표: {_sentiment_text(pr, tc)}")
 
     trg = np.where(rm != 0)[0]
     np.random.shuffle(trg)
@@ -246,6 +338,19 @@ def daum_review_analysis(ctx="cuda:0"):
 
 if __name__ == '__main__':
     # logging.disable(sys.maxsize)
+    parser = argparse.ArgumentParser(description="ABSA prototype")
+    parser.add_argument("--verify", action="store_true", help="KO-BERT cache 파일의 checksum 을 다시 계산")
+    parser.add_argument("--result-store", default=None,
+                        help="분석 결과 저장소 경로 (예: ~/kobert/result_store.db, 지정하지 않으면 사용하지 않음)")
+    parser.add_argument("--stream", action="store_true",
+                        help="영화 리뷰를 crawling 하는 동안 도착한 리뷰부터 분석")
+    parser.add_argument("--offline", action="store_true",
+                        help="network 를 사용하지 않고 HTTP cache 에 저장된 영화 리뷰만 분석")
+    parser.add_argument("--single-pass", action="store_true",
+                        help="aspect query model ({}) 로 리뷰당 한 번의 encoder 연산으로 모든 aspect 분석".format(
+                            ABSA_query_model_path))
+    args = parser.parse_args()
+
     print("### CUDA GPU 프로세서를 사용합니까?")
     print("[A]: Yes")
     print("[B]: No")
@@ -268,9 +373,10 @@ if __name__ == '__main__':
 
     print("")
     if key == 'A':
-        corpus_analysis(ctx=ctx)
+        corpus_analysis(ctx=ctx, verify=args.verify, result_store_path=args.result_store)
     else:
-        daum_review_analysis(ctx=ctx)
+        daum_review_analysis(ctx=ctx, single_pass=args.single_pass, verify=args.verify,
+                             result_store_path=args.result_store, stream=args.stream, offline=args.offline)
 
 
 
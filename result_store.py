@@ -0,0 +1,154 @@
+#  ABSA 분석 결과 저장소
+#  (정규화된 입력 문장, mask 된 aspect 쌍, model checkpoint) 의 hash 를 key 로 SA / ABSA 확률을 SQLite 에 저장한다.
+#  자주 사용되는 결과는 process 내부 LRU cache 에서 바로 반환하고, checkpoint 가 바뀌면 저장된 결과를 모두 무효화한다.
+
+import collections
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+
+def normalize_text(text):
+    # tokenizer 는 공백 종류 / 개수를 구분하지 않으므로 공백을 하나로 합친다
+    return " ".join(text.split())
+
+
+class ResultStore:
+    """
+        content-addressed 분석 결과 저장소
+
+        ##### parms info #####
+        path: SQLite file 경로
+        lru_size: process 내부 LRU cache 크기
+
+        set_model(model_tag) 로 현재 model 을 지정해야 사용할 수 있으며, 저장된 model_tag 와 다르면
+        이전 결과를 모두 삭제한다.
+    """
+    def __init__(self, path="~/kobert/result_store.db", lru_size=65536):
+        self.path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self.lru_size = lru_size
+        self._lru = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.model_tag = None
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS result (key BLOB PRIMARY KEY, value BLOB NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+    def _get_meta(self, name):
+        row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def checkpoint_hash(self, model_path, chunk_size=1024 * 1024):
+        """
+            model file 의 md5, file 크기와 수정 시각이 같으면 이전에 계산한 값을 사용한다
+        """
+        stat = os.stat(model_path)
+        name = "checkpoint:{}:{}:{}".format(os.path.abspath(model_path), stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            value = self._get_meta(name)
+            if value is None:
+                md5 = hashlib.md5()
+                with open(model_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(chunk_size), b''):
+                        md5.update(chunk)
+                value = md5.hexdigest()
+                self._set_meta(name, value)
+                self._conn.commit()
+        return value
+
+    def set_model(self, model_tag):
+        """
+            현재 model 지정, 저장된 결과가 다른 model 의 결과이면 모두 무효화한다
+        """
+        with self._lock:
+            stored_tag = self._get_meta("model_tag")
+            if stored_tag != model_tag:
+                if stored_tag is not None:
+                    logging.info("model checkpoint changed, invalidating result store")
+                self._invalidate()
+                self._set_meta("model_tag", model_tag)
+                self._conn.commit()
+            self.model_tag = model_tag
+
+    def _invalidate(self):
+        self._conn.execute("DELETE FROM result")
+        self._lru.clear()
+
+    def invalidate(self):
+        with self._lock:
+            self._invalidate()
+            self._conn.commit()
+
+    def key(self, text, aspect_pair=None):
+        content = "{}\x00{}\x00{}".format(self.model_tag, normalize_text(text), aspect_pair)
+        return hashlib.sha1(content.encode("utf-8")).digest()
+
+    def get_many(self, keys):
+        """
+            key 별 (result_0, result_1, result_2) 또는 None
+        """
+        values = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                value = self._lru.get(key)
+                if value is None:
+                    missing.append(i)
+                else:
+                    self._lru.move_to_end(key)
+                    values[i] = value
+
+            # SQLite 변수 개수 제한 때문에 나누어 조회
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                chunk_keys = [keys[i] for i in chunk]
+                rows = dict(self._conn.execute("SELECT key, value FROM result WHERE key IN ({})".format(
+                    ",".join("?" * len(chunk_keys))), chunk_keys).fetchall())
+                for i in chunk:
+                    value = rows.get(keys[i])
+                    if value is not None:
+                        values[i] = value
+                        self._put_lru(keys[i], value)
+
+        return [self._decode(value) if value is not None else None for value in values]
+
+    def put_many(self, keys, result_0, result_1, result_2):
+        values = np.concatenate([result_0, result_1, result_2], axis=1).astype(np.float32)
+        rows = [(key, values[i].tobytes()) for i, key in enumerate(keys)]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO result (key, value) VALUES (?, ?)", rows)
+            self._conn.commit()
+            for key, value in rows:
+                self._put_lru(key, value)
+
+    def _put_lru(self, key, value):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    @staticmethod
+    def _decode(value):
+        # SA (2) + ABSA 1 (3) + ABSA 2 (3)
+        value = np.frombuffer(value, dtype=np.float32)
+        return value[:2], value[2:5], value[5:8]
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM result").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
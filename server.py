@@ -0,0 +1,342 @@
+#  ABSA Model HTTP 추론 서버
+#  동시에 들어온 요청을 asyncio queue 에 모아 micro-batch 단위로 ABSAModel 에 전달한다.
+#
+#  POST /sa    {"texts": [...]}  ->  {"results": [{"negative": 0.1, "positive": 0.9}, ...]}
+#  POST /absa  {"texts": [...]}  ->  {"results": [{"연기": {"label": "positive", "score": 0.9}, ...}, ...]}
+#  GET  /health
+#
+#  실행 예시: python server.py --ctx cpu --port 5000
+#           python server.py --ctx cpu --port 5000 --workers 4  (worker_pool.InferencePool 로 multi-process 추론)
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import logging
+
+import numpy as np
+
+ABSA_LABEL = ["negative", "none", "positive"]
+
+HTTP_REASON = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class Overloaded(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _retrieve_exception(future):
+    # 같은 text 의 future 를 여러 요청이 공유하므로, 모든 요청이 timeout 으로 먼저 끝나도
+    # "exception was never retrieved" 경고가 남지 않도록 예외를 확인해 둔다
+    if not future.cancelled():
+        future.exception()
+
+
+class MicroBatcher:
+    """
+        요청을 queue 에 모아 batch 단위로 처리
+
+        ##### parms info #####
+        handler: list of text -> list of result (blocking 함수, executor 에서 실행)
+        max_batch_size: batch 최대 크기
+        max_wait: 첫 요청 도착 후 batch 를 채우기 위해 기다리는 최대 시간 (초)
+        max_queue: 대기 가능한 최대 요청 수, 초과하면 Overloaded (load shedding)
+
+        처리 중이거나 대기 중인 같은 text 는 하나로 합쳐서 한 번만 분석한다.
+    """
+    def __init__(self, handler, max_batch_size=32, max_wait=0.01, max_queue=1024):
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+
+        self.queue = None
+        self.pending = {}
+
+    def submit_all(self, texts):
+        """
+            text 목록을 queue 에 추가하고 future 목록 반환
+        """
+        new_texts = set(text for text in texts if text not in self.pending)
+        if self.queue.qsize() + len(new_texts) > self.max_queue:
+            raise Overloaded()
+
+        loop = asyncio.get_event_loop()
+        futures = []
+        for text in texts:
+            future = self.pending.get(text)
+            if future is None:
+                future = loop.create_future()
+                future.add_done_callback(_retrieve_exception)
+                self.pending[text] = future
+                self.queue.put_nowait(text)
+            futures.append(future)
+
+        return futures
+
+    async def run(self, executor):
+        loop = asyncio.get_event_loop()
+        self.queue = asyncio.Queue()
+
+        while True:
+            texts = [await self.queue.get()]
+
+            # max_batch_size 또는 max_wait 까지 batch 구성
+            deadline = loop.time() + self.max_wait
+            while len(texts) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    texts.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                results = await loop.run_in_executor(executor, self.handler, texts)
+            except Exception as e:
+                logging.exception("batch inference failed")
+                for text in texts:
+                    self.pending.pop(text).set_exception(e)
+                continue
+
+            for text, result in zip(texts, results):
+                self.pending.pop(text).set_result(result)
+
+
+def _analyze(model, pool, corpus_list, sa, absa):
+    # pool 이 있으면 batch 를 worker 수만큼 나누어 worker process 에서 동시에 분석
+    if pool is None:
+        return model.analyze(model.tokenize(corpus_list), sa=sa, absa=absa)
+    chunk_size = max(1, -(-len(corpus_list) // pool.num_workers))
+    return pool.analyze(corpus_list, sa=sa, absa=absa, chunk_size=chunk_size)
+
+
+def sa_handler(model, pool=None):
+    def handler(texts):
+        result_0, _, _ = _analyze(model, pool, texts, sa=True, absa=False)
+        return [{"negative": float(r[0]), "positive": float(r[1])} for r in result_0]
+    return handler
+
+
+def absa_handler(model, pool=None):
+    from prototype import MOVIE_ASPECT, _aspect_mask_to_corpus
+
+    def handler(texts):
+        results = [{} for _ in texts]
+        masked_corpus_list, masked_corpus_info = _aspect_mask_to_corpus(texts, model.opt)
+        if len(masked_corpus_list) == 0:
+            return results
+
+        _, result_1, result_2 = _analyze(model, pool, masked_corpus_list, sa=False, absa=True)
+        for idx, (review_idx, aspect_1, aspect_2) in enumerate(masked_corpus_info):
+            for aspect, result in [(aspect_1, result_1[idx]), (aspect_2, result_2[idx])]:
+                if aspect != -1:
+                    results[review_idx][MOVIE_ASPECT[aspect]] = {"label": ABSA_LABEL[int(np.argmax(result))],
+                                                                 "score": float(np.max(result))}
+        return results
+    return handler
+
+
+class InferenceServer:
+    """
+        ABSAModel HTTP 서버 (HTTP/1.1 keep-alive, JSON)
+
+        ##### parms info #####
+        max_body_size: 요청 body 최대 크기 (byte), 넘으면 body 를 읽지 않고 413 을 보낸 뒤 연결을 닫는다
+        max_header_count: 요청 header 최대 개수
+        pool: worker_pool.InferencePool (None 이면 model 로 현재 process 에서 분석)
+
+        요청 line 이나 header 가 잘못되면 400 을 보낸 뒤 연결을 닫는다.
+    """
+    def __init__(self, model, max_batch_size=32, max_wait=0.01, max_queue=1024, timeout=10.0,
+                 max_body_size=1 << 20, max_header_count=100, pool=None):
+        self.timeout = timeout
+        self.max_body_size = max_body_size
+        self.max_header_count = max_header_count
+        self.batchers = {
+            "/sa": MicroBatcher(sa_handler(model, pool), max_batch_size, max_wait, max_queue),
+            "/absa": MicroBatcher(absa_handler(model, pool), max_batch_size, max_wait, max_queue),
+        }
+
+    async def dispatch(self, method, path, body):
+        if path == "/health":
+            return 200, {"status": "ok", "queue": {p: b.queue.qsize() for p, b in self.batchers.items()}}
+
+        batcher = self.batchers.get(path)
+        if batcher is None:
+            return 404, {"error": "unknown path"}
+        if method != "POST":
+            return 405, {"error": "POST required"}
+
+        try:
+            texts = json.loads(body.decode("utf-8"))["texts"]
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise ValueError
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": "request body must be {\"texts\": [string, ...]}"}
+
+        try:
+            futures = batcher.submit_all(texts)
+        except Overloaded:
+            return 503, {"error": "server overloaded"}
+
+        try:
+            results = await asyncio.wait_for(asyncio.gather(*[asyncio.shield(f) for f in futures]), self.timeout)
+        except asyncio.TimeoutError:
+            return 504, {"error": "timeout"}
+        except Exception as e:
+            return 500, {"error": str(e)}
+
+        return 200, {"results": results}
+
+    async def read_request(self, reader):
+        """
+            요청 line / header / body 를 읽어 (method, path, version, headers, body) 반환, 연결이 끝났으면 None
+        """
+        try:
+            request_line = await reader.readline()
+        except ValueError:
+            raise BadRequest(400, "request line too long")
+        if not request_line:
+            return None
+        parts = request_line.decode("latin-1").split()
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            raise BadRequest(400, "malformed request line")
+        method, path, version = parts
+
+        headers = {}
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                raise BadRequest(400, "header line too long")
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, sep, value = line.decode("latin-1").partition(":")
+            if not sep or not name.strip() or len(headers) >= self.max_header_count:
+                raise BadRequest(400, "malformed header")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            content_length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise BadRequest(400, "invalid content-length")
+        if content_length < 0:
+            raise BadRequest(400, "invalid content-length")
+        if content_length > self.max_body_size:
+            raise BadRequest(413, "request body larger than {} bytes".format(self.max_body_size))
+        body = await reader.readexactly(content_length)
+
+        return method, path, version, headers, body
+
+    @staticmethod
+    async def write_response(writer, status, payload, keep_alive):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        header = ("HTTP/1.1 {} {}\r\n"
+                  "Content-Type: application/json; charset=utf-8\r\n"
+                  "Content-Length: {}\r\n"
+                  "Connection: {}\r\n\r\n").format(status, HTTP_REASON[status], len(data),
+                                                  "keep-alive" if keep_alive else "close")
+        writer.write(header.encode("latin-1") + data)
+        await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except BadRequest as e:
+                    # 남은 요청을 어디서부터 읽어야 할지 알 수 없으므로 응답 후 연결을 닫는다
+                    await self.write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, version, headers, body = request
+
+                status, payload = await self.dispatch(method, path.split("?")[0], body)
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self.write_response(writer, status, payload, keep_alive)
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        for batcher in self.batchers.values():
+            asyncio.ensure_future(batcher.run(executor))
+
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        logging.info("serving on {}:{}".format(host, port))
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ABSA inference server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--ctx", default="cpu")
+    parser.add_argument("--model", default="ABSA_model.pt")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    parser.add_argument("--max-queue", type=int, default=1024)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--max-body-size", type=int, default=1 << 20, help="요청 body 최대 크기 (byte)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="CPU 추론 worker process 개수 (0 이면 server process 에서 분석, --ctx cpu 에서만 사용)")
+    parser.add_argument("--threads-per-worker", type=int, default=1, help="worker 별 intra-op thread 수")
+    parser.add_argument("--verify", action="store_true", help="force a full checksum of cached KO-BERT files")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    from model import ABSAModel
+
+    model = ABSAModel(ctx=args.ctx)
+    model.load_kobert(verify=args.verify)
+    if not model.load_model(args.model):
+        return
+
+    pool = None
+    if args.workers > 0:
+        if args.ctx != "cpu":
+            logging.error("--workers requires --ctx cpu")
+            return
+        from worker_pool import InferencePool
+
+        # model 을 불러온 직후 (추론 / event loop thread 를 시작하기 전에) fork
+        pool = InferencePool(model=model, num_workers=args.workers, threads_per_worker=args.threads_per_worker)
+
+    server = InferenceServer(model, max_batch_size=args.max_batch_size, max_wait=args.max_wait_ms / 1000,
+                             max_queue=args.max_queue, timeout=args.timeout, max_body_size=args.max_body_size,
+                             pool=pool)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    finally:
+        if pool is not None:
+            pool.close()
+
+
+if __name__ == '__main__':
+    main()
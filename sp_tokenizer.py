@@ -0,0 +1,146 @@
+#  SentencePiece batch tokenizer
+#  gluonnlp BERTSPTokenizer + BERTSentenceTransform(pad=True, pair=False) 와 같은 결과를 batch 단위로 생성한다.
+#  basic tokenization 은 문자 단위 변환표 하나로 처리하고, 단어 단위 sentence-piece 결과는 cache 하며,
+#  [CLS] / [SEP] / padding 은 numpy 연산으로 한 번에 채운다.
+
+import unicodedata
+
+import numpy as np
+
+
+def _is_chinese_char(cp):
+    return ((0x4E00 <= cp <= 0x9FFF) or (0x3400 <= cp <= 0x4DBF) or (0x20000 <= cp <= 0x2A6DF) or
+            (0x2A700 <= cp <= 0x2B73F) or (0x2B740 <= cp <= 0x2B81F) or (0x2B820 <= cp <= 0x2CEAF) or
+            (0xF900 <= cp <= 0xFAFF) or (0x2F800 <= cp <= 0x2FA1F))
+
+
+def _is_punctuation(char):
+    cp = ord(char)
+    if (33 <= cp <= 47) or (58 <= cp <= 64) or (91 <= cp <= 96) or (123 <= cp <= 126):
+        return True
+    return unicodedata.category(char).startswith('P')
+
+
+class _BasicTokenizeTable(dict):
+    """
+        gluonnlp BERTBasicTokenizer(lower=False) 의 문자 단위 규칙을 str.translate 변환표로 표현
+
+        NFD 로 분해한 text 에 대해 제어 문자 / 결합 문자 (Mn) 제거, 공백 문자 -> ' ', 한자 / 문장 부호 -> ' c ' 로
+        바꾼 뒤 split() 하면 gluonnlp 0.10 BasicTokenizer 의 결과와 같다.
+        (gluonnlp 0.10 은 lower=False 이어도 NFD 분해 후 결합 문자를 제거한다)
+        변환표는 처음 등장한 문자에 대해서만 계산한다.
+    """
+    def __missing__(self, cp):
+        char = chr(cp)
+        if char in (' ', '\t', '\n', '\r') or unicodedata.category(char) == 'Zs':
+            value = ' '
+        elif cp == 0 or cp == 0xfffd or unicodedata.category(char).startswith('C'):
+            value = None
+        elif unicodedata.category(char) == 'Mn':
+            value = None
+        elif _is_chinese_char(cp) or _is_punctuation(char):
+            value = ' ' + char + ' '
+        else:
+            value = cp
+        self[cp] = value
+        return value
+
+
+class BatchSPTokenizer:
+    """
+        KO-BERT sentence-piece batch tokenizer
+
+        ##### parms info #####
+        sp_path: sentence-piece model path (kobert.utils.get_tokenizer())
+        vocab: KO-BERT vocab (gluonnlp BERTVocab)
+        max_len: max sequence length ([CLS], [SEP] 포함)
+        cache_size: 단어 단위 tokenization 결과 cache 크기
+    """
+    def __init__(self, sp_path, vocab, max_len, cache_size=1 << 16):
+        import sentencepiece
+
+        self.sp = sentencepiece.SentencePieceProcessor()
+        self.sp.Load(sp_path)
+        self.max_len = max_len
+        self.cache_size = cache_size
+
+        # sentence-piece id -> KO-BERT vocab id
+        self.sp_to_vocab = np.array([vocab[self.sp.IdToPiece(i)] for i in range(self.sp.GetPieceSize())],
+                                    dtype=np.int32)
+        self.cls_id = vocab[vocab.cls_token]
+        self.sep_id = vocab[vocab.sep_token]
+        self.pad_id = vocab[vocab.padding_token]
+
+        self._table = _BasicTokenizeTable()
+        self._cache = {}
+
+    def basic_tokenize(self, corpus):
+        if not corpus.isascii():
+            corpus = unicodedata.normalize("NFD", corpus)
+        return corpus.translate(self._table).split()
+
+    def _encode_words(self, words):
+        if hasattr(self.sp, 'encode'):
+            id_list = self.sp.encode(words, out_type=int)
+        else:
+            id_list = [self.sp.EncodeAsIds(word) for word in words]
+        return [self.sp_to_vocab[np.asarray(ids, dtype=np.int64)] for ids in id_list]
+
+    def encode(self, corpus_list):
+        """
+            문장별 KO-BERT vocab id 목록 ([CLS], [SEP] 제외, 자르기 전)
+        """
+        words_list = [self.basic_tokenize(corpus) for corpus in corpus_list]
+
+        cache = self._cache
+        missing = list({word for words in words_list for word in words if word not in cache})
+        if missing:
+            if len(cache) + len(missing) > self.cache_size:
+                cache.clear()
+            cache.update(zip(missing, self._encode_words(missing)))
+
+        empty = np.zeros(0, dtype=np.int32)
+        return [np.concatenate([cache[word] for word in words]) if words else empty for words in words_list]
+
+    def __call__(self, corpus_list):
+        """
+            (token_ids (N * max_len), valid_length (N,), segment_ids (N * max_len)) 반환, 모두 int32
+        """
+        ids_list = self.encode(corpus_list)
+        count = len(ids_list)
+
+        length = np.array([len(ids) for ids in ids_list], dtype=np.int64)
+        body_length = np.minimum(length, self.max_len - 2)
+        valid_length = (body_length + 2).astype(np.int32)
+
+        token_ids = np.full((count, self.max_len), self.pad_id, dtype=np.int32)
+        segment_ids = np.zeros((count, self.max_len), dtype=np.int32)
+        token_ids[:, 0] = self.cls_id
+
+        if length.sum() > 0:
+            # 문장별 위치 계산 후 max_len - 2 이내의 token 만 복사
+            flat = np.concatenate(ids_list)
+            row = np.repeat(np.arange(count), length)
+            start = np.cumsum(length) - length
+            position = np.arange(flat.shape[0]) - np.repeat(start, length)
+            keep = position < self.max_len - 2
+            token_ids[row[keep], position[keep] + 1] = flat[keep]
+
+        token_ids[np.arange(count), valid_length - 1] = self.sep_id
+
+        return token_ids, valid_length, segment_ids
+
+    def transform(self, corpus_list):
+        """
+            BERTSentenceTransform 결과와 같은 형태의 sentence_info 목록
+        """
+        token_ids, valid_length, segment_ids = self(corpus_list)
+        return [(token_ids[i], valid_length[i], segment_ids[i]) for i in range(len(corpus_list))]
+
+
+def get_batch_tokenizer(vocab, max_len, sp_path=None):
+    import kobert.utils
+
+    if sp_path is None:
+        sp_path = kobert.utils.get_tokenizer()
+    return BatchSPTokenizer(sp_path, vocab, max_len)
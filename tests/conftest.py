@@ -0,0 +1,6 @@
+#  repository 최상위 module (model.py, sp_tokenizer.py, ...) 을 test 에서 import 할 수 있도록 경로 추가
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,40 @@
+#  aspect 유사 단어 검색 / mask 치환 (prototype._aspect_mask_to_corpus, matcher.AspectMatcher)
+
+import numpy as np
+
+import prototype
+from matcher import AspectMatcher
+
+OPT = {"object_text_0": "[A]", "object_text_1": "[B]"}
+
+
+def _baseline_aspects(corpus, aspect_set=prototype.SIM_WORD_LIST):
+    # 기존 구현 (corpus.find 반복) 이 찾던 aspect 목록
+    return [idx for idx, aspect_list in enumerate(aspect_set) if any(corpus.find(word) != -1 for word in aspect_list)]
+
+
+def test_overlapping_synonyms_keep_every_aspect():
+    # "반전개" 에는 반전 (aspect 6) 과 전개 (스토리, aspect 2) 가 겹쳐 있다
+    masked_corpus_list, masked_corpus_info = prototype._aspect_mask_to_corpus(["반전개가 좋다"], OPT)
+
+    assert masked_corpus_info == [[0, 2, 6]]
+    assert masked_corpus_list == ["[B]개가 좋다"]
+
+
+def test_mask_and_hit_matrix_find_same_aspects():
+    corpus_list = ["반전개가 좋다", "연기 좋고 음악 최고", "이야기 전개와 노래, 사운드 모두 최고", "아무 내용 없음", "스케일이 크기만 하다"]
+
+    _, masked_corpus_info = prototype._aspect_mask_to_corpus(corpus_list, OPT)
+    hit = prototype._aspect_hit_matrix(corpus_list)
+
+    for corpus_idx, corpus in enumerate(corpus_list):
+        masked = sorted(asp for info in masked_corpus_info if info[0] == corpus_idx for asp in info[1:] if asp != -1)
+        assert masked == list(np.where(hit[corpus_idx])[0]) == _baseline_aspects(corpus)
+
+
+def test_spans_only_compare_selected_aspects():
+    matcher = AspectMatcher([["반전"], ["전개"]])
+
+    assert matcher.spans("반전개") == [(0, 2, 0)]
+    assert matcher.spans("반전개", aspects={1: "[A]"}) == [(1, 3, 1)]
+    assert matcher.replace("반전개", matcher.spans("반전개", {1: "[A]"}), {1: "[A]"}) == "반[A]"
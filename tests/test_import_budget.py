@@ -0,0 +1,20 @@
+#  entry point import 시간 / 무거운 framework import 여부 검사 (import_budget.py)
+#  설치되지 않은 package 때문에 import 할 수 없는 module 은 건너뛴다.
+
+import pytest
+
+import import_budget
+
+
+@pytest.mark.parametrize("module", sorted(import_budget.IMPORT_BUDGET))
+def test_import_budget(module):
+    budget, forbidden = import_budget.IMPORT_BUDGET[module]
+    try:
+        elapsed, loaded = import_budget.measure(module, repeat=3)
+    except ImportError as e:
+        if "ModuleNotFoundError" in str(e):
+            pytest.skip(str(e))
+        raise
+
+    assert not [m for m in loaded if m in forbidden], "{} imports {}".format(module, loaded)
+    assert elapsed <= budget, "{} import took {:.3f}s (budget {:.1f}s)".format(module, elapsed, budget)
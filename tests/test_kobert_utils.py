@@ -0,0 +1,124 @@
+#  KO-BERT artifact cache 의 manifest 신뢰 / 무효화 (kobert.utils.download, verify_cache)
+#  network 를 사용하지 않도록 requests 는 고정된 내용을 반환하는 module 로 바꾼다.
+
+import hashlib
+import os
+import subprocess
+import sys
+import types
+
+import pytest
+
+import kobert.utils
+
+CONTENT = b"kobert tokenizer artifact"
+CHKSUM = hashlib.md5(CONTENT).hexdigest()[:10]
+FNAME = "artifact.spiece"
+
+
+@pytest.fixture
+def md5_calls(monkeypatch):
+    calls = []
+    md5sum = kobert.utils._md5sum
+
+    def counting_md5sum(file_path, *args, **kwargs):
+        calls.append(os.path.basename(file_path))
+        return md5sum(file_path, *args, **kwargs)
+
+    monkeypatch.setattr(kobert.utils, "_md5sum", counting_md5sum)
+    return calls
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    # download 요청 기록, 응답 내용은 served[0]
+    requested = []
+    served = [CONTENT]
+
+    def get(url, stream=False):
+        requested.append(url)
+        return types.SimpleNamespace(headers={}, content=served[0])
+
+    monkeypatch.setitem(sys.modules, "requests", types.SimpleNamespace(get=get))
+    return requested, served
+
+
+def _download(cachedir, verify=False):
+    return kobert.utils.download("http://example.invalid/" + FNAME, FNAME, CHKSUM, cachedir=str(cachedir),
+                                 verify=verify)
+
+
+def _write(cachedir, content=CONTENT):
+    path = cachedir / FNAME
+    path.write_bytes(content)
+    return path
+
+
+def test_verified_file_is_trusted_without_hashing(tmp_path, md5_calls, downloads):
+    _write(tmp_path)
+    assert _download(tmp_path) == str(tmp_path / FNAME)
+    assert md5_calls == [FNAME]  # 처음에는 hash 를 계산하여 manifest 에 기록
+
+    assert _download(tmp_path) == str(tmp_path / FNAME)
+    assert md5_calls == [FNAME]
+    assert downloads[0] == []
+
+
+def test_size_or_mtime_change_forces_rehash(tmp_path, md5_calls, downloads):
+    path = _write(tmp_path)
+    _download(tmp_path)
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    _download(tmp_path)
+    assert md5_calls == [FNAME, FNAME]
+
+    # 크기가 바뀌면 checksum 도 맞지 않으므로 다시 download 한다
+    _write(tmp_path, CONTENT + b"!")
+    _download(tmp_path)
+    assert len(downloads[0]) == 1
+    assert path.read_bytes() == CONTENT
+
+    # download 후 manifest 가 갱신되어 다시 신뢰한다
+    calls = len(md5_calls)
+    _download(tmp_path)
+    assert len(md5_calls) == calls
+
+
+def test_checksum_mismatch_is_rejected(tmp_path, md5_calls, downloads):
+    _, served = downloads
+    served[0] = b"corrupted artifact"
+    _write(tmp_path, b"stale artifact")
+
+    with pytest.raises(AssertionError, match="corrupted"):
+        _download(tmp_path)
+    assert FNAME not in kobert.utils._load_manifest(str(tmp_path))
+
+
+def test_verify_forces_rehash(tmp_path, md5_calls, downloads):
+    _write(tmp_path)
+    _download(tmp_path)
+    _download(tmp_path, verify=True)
+    assert md5_calls == [FNAME, FNAME]
+
+
+def test_verify_cache_detects_same_size_corruption(tmp_path, capsys):
+    path = _write(tmp_path)
+    kobert.utils._record_verified(str(tmp_path), str(path), CHKSUM)
+    assert kobert.utils.verify_cache(str(tmp_path))
+
+    # 크기 / mtime 이 같아도 verify_cache 는 내용을 다시 hash 한다
+    stat = os.stat(path)
+    path.write_bytes(CONTENT[::-1])
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert kobert.utils._is_verified(str(path), CHKSUM, kobert.utils._load_manifest(str(tmp_path)))
+    assert not kobert.utils.verify_cache(str(tmp_path))
+    assert "corrupted" in capsys.readouterr().out
+
+
+def test_cli_without_verify_prints_usage(tmp_path):
+    proc = subprocess.run([sys.executable, "-m", "kobert.utils", "--cachedir", str(tmp_path)],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert proc.returncode == 2
+    assert b"usage:" in proc.stderr and b"--verify" in proc.stderr
@@ -0,0 +1,97 @@
+#  저장해 둔 grade page (crawler/fixtures) 로 ReviewSpider parsing 결과 확인 (network 미사용)
+
+import os
+
+import pytest
+
+pytest.importorskip("scrapy")
+
+from lxml import html
+
+from scrapy.http import HtmlResponse, Request
+
+from crawler import benchmark
+from crawler.items import CrawlerItem
+from crawler.pipelines import normalize_review
+from crawler.spiders.reviewbot import ReviewSpider, parse_grade_page
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "crawler", "fixtures")
+
+
+def _parse(name):
+    with open(os.path.join(FIXTURE_DIR, name), "rb") as f:
+        return parse_grade_page(html.fromstring(f.read()))
+
+
+def test_parse_grade_page():
+    titles, review_text_list = _parse("grade_page_001.html")
+
+    assert titles == ["샘플 영화"]
+    assert review_text_list == [
+        ["배우들 연기가 정말 좋았어요"],
+        ["스토리는 조금 뻔했지만", "음악이 최고!!! 👍"],
+        [],
+        ["The ending was great ㅋㅋㅋ 10/10"],
+        ["  연출, 촬영, 편집 & 모두 훌륭함...  "],
+    ]
+    assert [normalize_review(fragments) for fragments in review_text_list] == [
+        "배우들 연기가 정말 좋았어요",
+        "스토리는 조금 뻔했지만 음악이 최고",
+        "",
+        "The ending was great ㅋㅋㅋ 1010",
+        "연출 촬영 편집 모두 훌륭함",
+    ]
+
+
+def test_parse_empty_grade_page():
+    assert _parse("grade_page_003.html") is None
+
+
+def test_replay_fixtures():
+    fixtures = benchmark.load_fixtures(FIXTURE_DIR)
+    assert [name for name, _ in fixtures] == ["grade_page_001.html", "grade_page_002.html", "grade_page_003.html"]
+
+    pages, items, _ = benchmark.replay(fixtures, repeat=2)
+    assert (pages, items) == (6, 16)
+
+
+def _response(name, page, status=200):
+    url = benchmark.FIXTURE_URL.format(page)
+    with open(os.path.join(FIXTURE_DIR, name), "rb") as f:
+        body = f.read() if status == 200 else b""
+    return HtmlResponse(url, status=status, body=body, encoding="utf-8", request=Request(url))
+
+
+def _callback(spider, name, page, status=200):
+    results = list(spider.parse_review_n_rank(_response(name, page, status), page=page))
+    items = [result for result in results if isinstance(result, CrawlerItem)]
+    pages = [result.cb_kwargs["page"] for result in results if isinstance(result, Request)]
+    return items, pages
+
+
+def test_error_page_stops_page_window():
+    spider = ReviewSpider(domain=benchmark.MOVIE_URL, page_window=4)
+    spider.page_request(1)  # start_requests
+
+    items, pages = _callback(spider, "grade_page_001.html", 1)
+    assert len(items) == 5 and pages == [2, 3, 4, 5]
+
+    # page 3 오류: 이후 page 는 요청하지 않고, 이미 요청한 page 4, 5 의 응답도 사용하지 않는다
+    assert _callback(spider, "grade_page_001.html", 3, status=500) == ([], [])
+    assert spider.is_error and spider.last_page == 2
+
+    items, pages = _callback(spider, "grade_page_002.html", 2)
+    assert len(items) == 3 and pages == []
+    assert _callback(spider, "grade_page_002.html", 4) == ([], [])
+    assert _callback(spider, "grade_page_002.html", 5) == ([], [])
+
+
+def test_empty_page_stops_page_window():
+    spider = ReviewSpider(domain=benchmark.MOVIE_URL, page_window=2)
+    spider.page_request(1)  # start_requests
+
+    assert _callback(spider, "grade_page_001.html", 1)[1] == [2, 3]
+    assert _callback(spider, "grade_page_003.html", 3) == ([], [])
+    assert spider.is_end and not spider.is_error and spider.last_page == 2
+    items, pages = _callback(spider, "grade_page_002.html", 2)
+    assert len(items) == 3 and pages == []
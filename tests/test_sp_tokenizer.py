@@ -0,0 +1,143 @@
+#  sp_tokenizer.BatchSPTokenizer 와 gluonnlp BERTSPTokenizer + BERTSentenceTransform 결과 비교
+#  작은 sentence-piece model 을 직접 학습하므로 KO-BERT / NSMC download 없이 실행된다.
+
+import numpy as np
+import pytest
+
+nlp = pytest.importorskip("gluonnlp")
+sentencepiece = pytest.importorskip("sentencepiece")
+
+import sp_tokenizer
+
+MAX_LEN = 16
+
+TRAIN_CORPUS = [
+    "영화 정말 재미있어요 배우들 연기가 최고입니다",
+    "스토리가 너무 지루했다 음악은 좋았지만 전개가 느려서 별로",
+    "액션 장면이 화려하고 반전도 좋았다",
+    "감독의 연출이 뛰어나고 촬영도 훌륭했다",
+    "The movie was great and the actors were amazing",
+    "I would not watch it again, too long and boring",
+    "두 번 봤습니다 강력 추천합니다 ㅋㅋㅋ",
+    "숫자 123 과 영어 ABC 가 섞인 리뷰 2020",
+]
+
+CORPUS = [
+    "", " ", "!!!", "ㅋㅋㅋㅋ", "영화 정말 재미있어요", "재미있어요!!! 최고,,, 감동...",
+    "漢字 혼용 文章", "中文字符测试", "tab\tnew\nline\rreturn", "\x00제어\x07문자�끝", "zero​width",
+    "전각　공백 nbsp", "(괄호) [대괄호] {중괄호} <꺾쇠>", "이모지 😀 포함", "accent café naïve",
+    "처음 보는 글자 뷁 뙇 똠", "결합 문자 e\u0301 a\u0308", "Ω ﬁ ① ㈜", "A" * 40, "영화 " * 30, "The movie was great, I LOVED it!",
+]
+
+
+# identity: sentence-piece 가 NFKC 로 다시 합치지 않으므로 NFD 분해 여부 (한글 자모 등) 까지 비교된다
+@pytest.fixture(scope="module", params=["nmt_nfkc", "identity"])
+def sp_model(request, tmp_path_factory):
+    directory = tmp_path_factory.mktemp("sp")
+    corpus_path = directory / "corpus.txt"
+    corpus_path.write_text("\n".join(TRAIN_CORPUS * 20), encoding="utf-8")
+    prefix = str(directory / "tiny")
+    sentencepiece.SentencePieceTrainer.Train(
+        "--input={} --model_prefix={} --vocab_size=120 --character_coverage=0.98 --hard_vocab_limit=false "
+        "--user_defined_symbols=[PAD],[CLS],[SEP],[MASK] --normalization_rule_name={} --minloglevel=2".format(
+            corpus_path, prefix, request.param))
+    return prefix + ".model"
+
+
+@pytest.fixture(scope="module")
+def vocab(sp_model):
+    return nlp.vocab.BERTVocab.from_sentencepiece(sp_model, padding_token="[PAD]")
+
+
+class _NoSamplingProcessor:
+    """
+        gluonnlp 는 SampleEncodeAsPieces(text, nbest_size=0, alpha) 로 sampling 없이 tokenization 하는데,
+        sentencepiece 0.1.96 이후로는 이 호출이 RuntimeError 를 발생시킨다.
+        nbest_size=0 은 sampling 하지 않는다는 뜻이므로 EncodeAsPieces 로 처리한다.
+    """
+    def __init__(self, processor):
+        self._processor = processor
+
+    def SampleEncodeAsPieces(self, text, nbest_size, alpha):
+        assert nbest_size == 0
+        return self._processor.EncodeAsPieces(text)
+
+    def __getattr__(self, name):
+        return getattr(self._processor, name)
+
+
+def _bert_tokenizer(sp_model, vocab):
+    bert_tokenizer = nlp.data.BERTSPTokenizer(sp_model, vocab, lower=False)
+    bert_tokenizer._activate_sp()
+    processor = bert_tokenizer.sentencepiece._processor
+    bert_tokenizer.sentencepiece._processor = _NoSamplingProcessor(processor)
+    return bert_tokenizer
+
+
+def _expected(sp_model, vocab, corpus_list):
+    transform = nlp.data.BERTSentenceTransform(_bert_tokenizer(sp_model, vocab), max_seq_length=MAX_LEN, pad=True,
+                                               pair=False)
+    return [transform([corpus]) for corpus in corpus_list]
+
+
+def test_batch_tokenizer_matches_gluonnlp(sp_model, vocab):
+    expected = _expected(sp_model, vocab, CORPUS)
+    token_ids, valid_length, segment_ids = sp_tokenizer.BatchSPTokenizer(sp_model, vocab, MAX_LEN)(CORPUS)
+
+    assert token_ids.shape == (len(CORPUS), MAX_LEN)
+    for i, (corpus, (ids, length, segment)) in enumerate(zip(CORPUS, expected)):
+        assert token_ids[i].tolist() == ids.tolist(), corpus
+        assert int(valid_length[i]) == int(length), corpus
+        assert segment_ids[i].tolist() == segment.tolist(), corpus
+    assert token_ids.dtype == expected[0][0].dtype
+
+
+def test_truncation_and_cache_reuse(sp_model, vocab):
+    tokenizer = sp_tokenizer.BatchSPTokenizer(sp_model, vocab, MAX_LEN, cache_size=8)
+    long_corpus = ["영화 " * 30, "A" * 40]
+    expected = _expected(sp_model, vocab, long_corpus)
+
+    # 작은 cache 가 비워진 뒤에도 같은 결과여야 한다
+    for _ in range(3):
+        token_ids, valid_length, _ = tokenizer(long_corpus + CORPUS)
+        for i, (ids, length, _) in enumerate(expected):
+            assert int(valid_length[i]) == MAX_LEN
+            assert token_ids[i].tolist() == ids.tolist()
+
+
+def test_transform_returns_sentence_info(sp_model, vocab):
+    transform = sp_tokenizer.BatchSPTokenizer(sp_model, vocab, MAX_LEN).transform
+    expected = _expected(sp_model, vocab, CORPUS)
+    for actual, (ids, length, segment) in zip(transform(CORPUS), expected):
+        assert np.array_equal(actual[0], ids)
+        assert int(actual[1]) == int(length)
+        assert np.array_equal(actual[2], segment)
+
+
+@pytest.mark.parametrize("native_tokenizer", [True, False])
+def test_model_tokenize_paths_follow_native_tokenizer(sp_model, vocab, monkeypatch, native_tokenizer):
+    md = pytest.importorskip("model")
+    import kobert.utils
+
+    # KO-BERT tokenizer 대신 test 용 sentence-piece model 사용
+    monkeypatch.setattr(kobert.utils, "get_tokenizer", lambda *args, **kwargs: sp_model)
+    bert_tokenizer = _bert_tokenizer(sp_model, vocab)
+    records = [[corpus, label] for label, corpus in enumerate(CORPUS)]
+    expected = _expected(sp_model, vocab, CORPUS)
+
+    transform = md.get_sentence_transform(vocab, MAX_LEN, bert_tokenizer=bert_tokenizer,
+                                          native_tokenizer=native_tokenizer)
+    assert isinstance(getattr(transform, "__self__", None), sp_tokenizer.BatchSPTokenizer) == native_tokenizer
+
+    columnar = md.ColumnarBERTDataset.from_records(records, 0, 1, bert_tokenizer, MAX_LEN, chunk_size=4,
+                                                   native_tokenizer=native_tokenizer)
+    dataset = md.BERTDataset(records, 0, 1, bert_tokenizer, MAX_LEN, pad=True, pair=False,
+                             native_tokenizer=native_tokenizer)
+    for i, (ids, length, segment) in enumerate(expected):
+        for actual in (transform(CORPUS)[i], dataset[i]):
+            assert np.array_equal(actual[0], ids)
+            assert int(actual[1]) == int(length)
+            assert np.array_equal(actual[2], segment)
+        assert columnar.token_ids[i].tolist() == ids.tolist()
+        assert int(columnar.valid_length[i]) == int(length)
+        assert int(columnar.labels[i]) == i
@@ -0,0 +1,69 @@
+#  worker_pool.InferencePool 생성 인자 확인 및 server 연동 (KO-BERT 없이 model 대신 간단한 객체 사용)
+
+import asyncio
+import concurrent.futures
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+
+import server
+import worker_pool
+
+
+class _EchoModel:
+    # text 길이로 결과를 만드는 ABSAModel 대용 (tokenize / analyze interface 만 구현)
+    _state = True
+    opt = {"batch_size": 2, "object_text_0": "대상", "object_text_1": "측면"}
+
+    def tokenize(self, corpus_list):
+        return list(corpus_list)
+
+    def analyze(self, sentence_info, sa=True, absa=False):
+        length = np.array([len(text) for text in sentence_info], dtype=float)
+        result_0 = np.stack([length, -length], axis=1) if sa else None
+        result_1 = np.stack([length, length, length], axis=1) if absa else None
+        return result_0, result_1, result_1
+
+
+def test_pool_requires_model_or_path():
+    with pytest.raises(ValueError, match="model or model_path"):
+        worker_pool.InferencePool()
+
+
+@pytest.mark.parametrize("kwargs", [{"num_workers": 0}, {"threads_per_worker": 0}])
+def test_pool_rejects_invalid_worker_count(kwargs):
+    with pytest.raises(ValueError):
+        worker_pool.InferencePool(model=_EchoModel(), **kwargs)
+
+
+def test_pool_rejects_uninitialized_model():
+    model = _EchoModel()
+    model._state = False
+    with pytest.raises(ValueError, match="initialized"):
+        worker_pool.InferencePool(model=model, num_workers=1)
+
+
+def test_server_uses_pool():
+    texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+    with worker_pool.InferencePool(model=_EchoModel(), num_workers=2) as pool:
+        result_0, result_1, _ = pool.analyze(texts, sa=True, absa=True, chunk_size=2)
+        assert result_0[:, 0].tolist() == [1, 2, 3, 4, 5]
+        assert result_1.shape == (5, 3)
+
+        inference_server = server.InferenceServer(_EchoModel(), pool=pool)
+
+        async def request():
+            batcher = inference_server.batchers["/sa"]
+            runner = asyncio.ensure_future(batcher.run(concurrent.futures.ThreadPoolExecutor(1)))
+            await asyncio.sleep(0)
+            try:
+                return await inference_server.dispatch("POST", "/sa", json.dumps({"texts": texts}).encode("utf-8"))
+            finally:
+                runner.cancel()
+
+        status, payload = asyncio.run(request())
+        assert status == 200
+        assert [result["negative"] for result in payload["results"]] == [1, 2, 3, 4, 5]
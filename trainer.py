@@ -0,0 +1,366 @@
+#  SA / ABSA 공통 학습 모듈
+#  multi-worker data loading, batch 단위 checkpoint 저장 및 재시작, test subset / interval 평가, early stopping 을 지원한다.
+
+import model as md
+
+import torch
+import numpy as np
+
+import os
+import time
+import random
+import logging
+
+
+def build_optimizer(model, opt, t_total):
+    """
+        AdamW (bias / LayerNorm weight decay 제외) + linear warmup scheduler
+    """
+    import transformers
+
+    no_decay = ['bias', 'LayerNorm.weight']
+    optimizer_grouped_parameters = [
+        {'params': [p for n, p in model.named_parameters() if not any(nd in n for nd in no_decay)],
+         'weight_decay': 0.01},
+        {'params': [p for n, p in model.named_parameters() if any(nd in n for nd in no_decay)], 'weight_decay': 0.0}
+    ]
+    optimizer = transformers.AdamW(optimizer_grouped_parameters, lr=opt["learning_rate"])
+
+    warmup_steps = int(t_total * opt["warmup_ratio"])
+    scheduler = transformers.optimization.get_linear_schedule_with_warmup(optimizer, warmup_steps, t_total)
+    return optimizer, scheduler
+
+
+def sa_step(model, batch, device, opt, training):
+    """
+        BERTClassifier (sentiment analysis) 의 (loss, accuracy)
+    """
+    token_ids, valid_length, segment_ids, label = batch
+
+    # set batch
+    token_ids = token_ids.long().to(device)
+    segment_ids = segment_ids.long().to(device)
+    label = label.long().to(device)
+
+    # get word embedding
+    attention_mask = md.gen_attention_mask(token_ids, valid_length)
+    x = model.bert.get_input_embeddings()(token_ids)
+
+    # forward propagation
+    with md.autocast(opt["bf16"], device.type):
+        out = model(x, segment_ids, attention_mask)
+
+    loss = torch.nn.functional.cross_entropy(out, label)
+    return loss, md.calculate_accuracy(out, label)
+
+
+def absa_step(model, batch, device, opt, training):
+    """
+        ABSAClassifier 의 (loss, accuracy), label: N * 2 ([object_text_0 label, object_text_1 label])
+    """
+    token_ids, valid_length, segment_ids, label = batch
+
+    # set batch
+    token_ids = token_ids.long().to(device)
+    segment_ids = segment_ids.long().to(device)
+    label = label.long().to(device)
+
+    # get word embedding
+    attention_mask = md.gen_attention_mask(token_ids, valid_length)
+    x = model.bert.get_input_embeddings()(token_ids)
+
+    # forward propagation
+    with md.autocast(opt["bf16"], device.type):
+        _, out_1, out_2 = model(x, segment_ids, attention_mask, sa=False, absa=True)
+
+    loss = torch.nn.functional.cross_entropy(out_1, label[:, 0]) + \
+        torch.nn.functional.cross_entropy(out_2, label[:, 1])
+    accuracy_0 = md.calculate_accuracy(out_1, label[:, 0])
+    accuracy_1 = md.calculate_accuracy(out_2, label[:, 1])
+    return loss, (accuracy_0 + accuracy_1) / 2  # Average of correct count
+
+
+def aspect_query_step(make_target, dataset_aspect, train_records, test_records):
+    """
+        AspectQueryClassifier 용 step 함수 생성
+
+        ##### parms info #####
+        make_target: (rows, records) -> (batch aspect index 목록, 정답 행렬 (N * A), 제외할 정답은 -100)
+        dataset_aspect: aspect 단어 ColumnarBERTDataset
+        train_records, test_records: label 자리에 저장된 record index 가 가리키는 원본 record
+    """
+    def step(model, batch, device, opt, training):
+        token_ids, valid_length, segment_ids, rows = batch
+        batch_aspects, target = make_target(rows.tolist(), train_records if training else test_records)
+
+        # aspect query input
+        aspect_ids, aspect_length, _, _ = dataset_aspect[batch_aspects]
+        aspect_ids = torch.from_numpy(aspect_ids).long().to(device)
+        aspect_mask = md.gen_aspect_mask(aspect_ids, aspect_length)
+
+        # set batch
+        token_ids = token_ids.long().to(device)
+        segment_ids = segment_ids.long().to(device)
+        target = torch.from_numpy(target).to(device)
+
+        # get word embedding
+        attention_mask = md.gen_attention_mask(token_ids, valid_length)
+        word_embedding = model.bert.get_input_embeddings()
+        x = word_embedding(token_ids)
+        aspect_x = word_embedding(aspect_ids)
+
+        # forward propagation
+        with md.autocast(opt["bf16"], device.type):
+            _, out = model(x, segment_ids, attention_mask, aspect_x, aspect_mask, sa=False)
+        out = out.reshape(-1, out.shape[2])
+        target = target.reshape(-1)
+
+        # accuracy for labeled aspect
+        valid = target != -100
+        accuracy = md.calculate_accuracy(out[valid], target[valid]) if valid.any() else 0.0
+        return torch.nn.functional.cross_entropy(out, target, ignore_index=-100), accuracy
+
+    return step
+
+
+class ResumableBatchSampler(torch.utils.data.Sampler):
+    """
+        epoch 별 seed 로 batch 순서를 정하는 batch sampler
+
+        같은 seed, epoch 이면 항상 같은 순서를 만들고, start_batch 이전의 batch 는 건너뛰므로
+        checkpoint 로부터 학습을 정확히 이어서 진행할 수 있다.
+    """
+    def __init__(self, data_size, batch_size, shuffle=False, seed=0):
+        self.data_size = data_size
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self.start_batch = 0
+
+    def set_epoch(self, epoch, start_batch=0):
+        self.epoch = epoch
+        self.start_batch = start_batch
+
+    @property
+    def num_batches(self):
+        return (self.data_size + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        if self.shuffle:
+            generator = torch.Generator()
+            generator.manual_seed(self.seed + self.epoch)
+            order = torch.randperm(self.data_size, generator=generator).tolist()
+        else:
+            order = list(range(self.data_size))
+
+        for i in range(self.start_batch * self.batch_size, self.data_size, self.batch_size):
+            yield order[i:i + self.batch_size]
+
+    def __len__(self):
+        return self.num_batches - self.start_batch
+
+
+class Trainer:
+    """
+        학습 loop
+
+        ##### parms info #####
+        model: BERTClassifier, ABSAClassifier, AspectQueryClassifier
+        step: (model, batch, device, opt, training) -> (loss, accuracy) - sa_step, absa_step, aspect_query_step
+        train_dataset, test_dataset: ColumnarBERTDataset
+        opt: DEFAULT_OPTION 형식의 option (Trainer 항목 사용)
+        model_path: model state_dict 저장 경로 (평가 정확도가 가장 높은 model)
+        checkpoint_path: 학습 상태 저장 경로, None 이면 checkpoint 를 저장하지 않는다
+        shuffle: epoch 마다 train batch 순서를 섞는다
+
+        checkpoint 에는 model, optimizer, scheduler, random state, epoch / batch 위치가 저장되며,
+        fit() 은 checkpoint 가 있으면 저장된 batch 다음부터 학습을 이어서 진행한다.
+    """
+    def __init__(self, model, step, train_dataset, test_dataset, opt=md.DEFAULT_OPTION, ctx="cuda:0",
+                 model_path="model.pt", checkpoint_path=None, shuffle=False):
+        self.model = model
+        self.step = step
+        self.opt = opt
+        self.device = torch.device(ctx)
+        self.model_path = model_path
+        self.checkpoint_path = checkpoint_path
+
+        # train data loader
+        self.sampler = ResumableBatchSampler(len(train_dataset), opt["batch_size"], shuffle, opt["seed"])
+        self.train_dataloader = md.get_columnar_dataloader(train_dataset, opt["batch_size"],
+                                                           num_workers=opt["loader_workers"],
+                                                           pin_memory=opt["pin_memory"], batches=self.sampler)
+
+        # test data loader (eval_samples 가 지정되면 고정된 subset 만 평가)
+        eval_index = np.arange(len(test_dataset))
+        if 0 < opt["eval_samples"] < len(test_dataset):
+            rng = np.random.RandomState(opt["seed"])
+            eval_index = np.sort(rng.choice(len(test_dataset), opt["eval_samples"], replace=False))
+        eval_batches = [eval_index[batch].tolist() for batch in
+                        md.length_bucket_batches(test_dataset.valid_length[eval_index], opt["batch_size"])]
+        self.test_dataloader = md.get_columnar_dataloader(test_dataset, opt["batch_size"],
+                                                          num_workers=opt["loader_workers"],
+                                                          pin_memory=opt["pin_memory"], batches=eval_batches)
+
+        t_total = self.sampler.num_batches * opt["num_epochs"]
+        self.optimizer, self.scheduler = build_optimizer(model, opt, t_total)
+
+        # training state
+        self.epoch = 0
+        self.batch_id = 0
+        self.global_step = 0
+        self.train_accuracy = 0.0
+        self.best_accuracy = None
+        self.bad_evaluations = 0
+        self.stopped = False
+
+    def evaluate(self):
+        """
+            test dataset (또는 subset) 정확도
+        """
+        training = self.model.training
+        self.model.eval()
+
+        accuracy = 0.0
+        count = 0
+        with torch.no_grad():
+            for batch in self.test_dataloader:
+                _, batch_accuracy = self.step(self.model, batch, self.device, self.opt, False)
+                accuracy += batch_accuracy
+                count += 1
+
+        self.model.train(training)
+        return accuracy / max(count, 1)
+
+    def _evaluate_and_track(self):
+        test_accuracy = self.evaluate()
+        print("epoch {} step {} test accuracy {}".format(self.epoch + 1, self.global_step, test_accuracy))
+
+        if self.best_accuracy is None or test_accuracy > self.best_accuracy:
+            self.best_accuracy = test_accuracy
+            self.bad_evaluations = 0
+            torch.save(self.model.state_dict(), self.model_path)
+        else:
+            self.bad_evaluations += 1
+            patience = self.opt["early_stopping_patience"]
+            if patience and self.bad_evaluations >= patience:
+                logging.info("early stopping: no improvement in {} evaluations".format(patience))
+                self.stopped = True
+
+    def save_checkpoint(self):
+        if self.checkpoint_path is None:
+            return
+
+        state = {
+            "model": self.model.state_dict(),
+            "optimizer": self.optimizer.state_dict(),
+            "scheduler": self.scheduler.state_dict(),
+            "epoch": self.epoch,
+            "batch_id": self.batch_id,
+            "global_step": self.global_step,
+            "train_accuracy": self.train_accuracy,
+            "best_accuracy": self.best_accuracy,
+            "bad_evaluations": self.bad_evaluations,
+            "stopped": self.stopped,
+            "rng": {
+                "torch": torch.get_rng_state(),
+                "cuda": torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None,
+                "numpy": np.random.get_state(),
+                "python": random.getstate(),
+            },
+        }
+
+        # 저장 도중 중단되어도 이전 checkpoint 가 남도록 임시 파일에 저장한 뒤 교체
+        tmp_path = "{}.tmp".format(self.checkpoint_path)
+        torch.save(state, tmp_path)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def load_checkpoint(self):
+        if self.checkpoint_path is None or not os.path.isfile(self.checkpoint_path):
+            return False
+
+        state = torch.load(self.checkpoint_path, map_location=self.device)
+        self.model.load_state_dict(state["model"])
+        self.optimizer.load_state_dict(state["optimizer"])
+        self.scheduler.load_state_dict(state["scheduler"])
+        self.epoch = state["epoch"]
+        self.batch_id = state["batch_id"]
+        self.global_step = state["global_step"]
+        self.train_accuracy = state["train_accuracy"]
+        self.best_accuracy = state["best_accuracy"]
+        self.bad_evaluations = state["bad_evaluations"]
+        self.stopped = state["stopped"]
+
+        rng = state["rng"]
+        torch.set_rng_state(rng["torch"])
+        if rng["cuda"] is not None and torch.cuda.is_available():
+            torch.cuda.set_rng_state_all(rng["cuda"])
+        np.random.set_state(rng["numpy"])
+        random.setstate(rng["python"])
+
+        logging.info("resume from epoch {} batch {}".format(self.epoch + 1, self.batch_id))
+        return True
+
+    def fit(self, resume=True):
+        """
+            학습 실행, 평가 정확도가 가장 높은 model 을 model_path 에 저장한다
+        """
+        if resume:
+            self.load_checkpoint()
+
+        opt = self.opt
+        while self.epoch < opt["num_epochs"] and not self.stopped:
+            self.sampler.set_epoch(self.epoch, self.batch_id)
+            if self.batch_id == 0:
+                self.train_accuracy = 0.0
+
+            # Train Batch
+            self.model.train()
+            start = time.time()
+            for batch in self.train_dataloader:
+                self.optimizer.zero_grad()
+
+                # forward / backward propagation
+                loss, accuracy = self.step(self.model, batch, self.device, opt, True)
+                loss.backward()
+
+                # optimization
+                torch.nn.utils.clip_grad_norm_(self.model.parameters(), opt["max_grad_norm"])
+                self.optimizer.step()
+                self.scheduler.step()  # Update learning rate schedule
+
+                self.train_accuracy += accuracy
+                self.batch_id += 1
+                self.global_step += 1
+
+                if (self.batch_id - 1) % opt["log_interval"] == 0:
+                    print("epoch {} batch id {} loss {} train accuracy {}".format(
+                        self.epoch + 1, self.batch_id, loss.data.cpu().numpy(), self.train_accuracy / self.batch_id))
+
+                if opt["eval_interval"] and self.global_step % opt["eval_interval"] == 0:
+                    self._evaluate_and_track()
+                if opt["checkpoint_interval"] and self.global_step % opt["checkpoint_interval"] == 0:
+                    self.save_checkpoint()
+                if self.stopped:
+                    break
+
+            if self.stopped:
+                self.save_checkpoint()
+                break
+
+            print("epoch {} train accuracy {} ({:0.1f}s)".format(self.epoch + 1,
+                                                                 self.train_accuracy / max(self.batch_id, 1),
+                                                                 time.time() - start))
+
+            # epoch 마다 평가 (eval_interval 을 사용하지 않는 경우)
+            if not opt["eval_interval"]:
+                self._evaluate_and_track()
+
+            self.epoch += 1
+            self.batch_id = 0
+            self.save_checkpoint()
+
+        if self.best_accuracy is None:
+            torch.save(self.model.state_dict(), self.model_path)
+        return self.best_accuracy
@@ -0,0 +1,124 @@
+#  Multi-process CPU 추론 worker pool
+#  KO-BERT 와 ABSA model 을 부모 process 에서 한 번만 불러온 뒤 fork 하므로, 모든 worker 가 같은 weight page 를
+#  읽기 전용(copy-on-write)으로 공유한다. worker 마다 intra-op thread 수를 따로 지정하고, 필요하면 CPU core 에 고정한다.
+
+from model import ABSAModel
+
+import torch
+import numpy as np
+
+import os
+import logging
+import multiprocessing
+
+_pool_model = None
+
+
+def _init_worker(threads_per_worker, core_groups, worker_counter):
+    # worker 별 intra-op thread 수 지정
+    torch.set_num_threads(threads_per_worker)
+
+    if core_groups is not None:
+        with worker_counter.get_lock():
+            worker_id = worker_counter.value
+            worker_counter.value += 1
+        os.sched_setaffinity(0, core_groups[worker_id % len(core_groups)])
+
+
+def _analyze_chunk(args):
+    corpus_list, sa, absa = args
+    sentence_info = _pool_model.tokenize(corpus_list)
+    return _pool_model.analyze(sentence_info, sa=sa, absa=absa)
+
+
+class InferencePool:
+    """
+        CPU 추론 worker pool
+
+        ##### parms info #####
+        model_path: pre-trained ABSA model path
+        num_workers: worker process 개수 (기본값: CPU core 수 / threads_per_worker)
+        threads_per_worker: worker 별 intra-op thread 수 (기본값: 1)
+        pin_cores: worker 마다 서로 다른 CPU core 묶음에 고정
+        model: 이미 불러온 ABSAModel (ctx="cpu"), None 이면 model_path 로부터 불러온다
+
+        fork 를 사용하므로 Linux 에서만 동작한다.
+        부모 process 에서 추론을 먼저 실행하면 thread pool 상태가 fork 되어 문제가 생길 수 있으므로,
+        model 을 불러온 직후 pool 을 생성하는 것을 권장한다.
+        model / model_path 가 모두 없거나 model 을 불러오지 못하면 pool 을 만들기 전에 ValueError 를 발생시킨다.
+    """
+    def __init__(self, model_path=None, num_workers=None, threads_per_worker=None, pin_cores=False, model=None):
+        global _pool_model
+
+        if model is None and model_path is None:
+            raise ValueError("InferencePool requires model or model_path")
+        if num_workers is not None and num_workers < 1:
+            raise ValueError("num_workers must be at least 1: {}".format(num_workers))
+        if threads_per_worker is not None and threads_per_worker < 1:
+            raise ValueError("threads_per_worker must be at least 1: {}".format(threads_per_worker))
+
+        cores = sorted(os.sched_getaffinity(0))
+        if threads_per_worker is None:
+            threads_per_worker = 1
+        if num_workers is None:
+            num_workers = max(1, len(cores) // threads_per_worker)
+
+        if model is None:
+            model = ABSAModel(ctx="cpu")
+            model.load_kobert()
+            if not model.load_model(model_path):
+                raise ValueError("failed to load ABSA model: {}".format(model_path))
+        elif not model._state:
+            raise ValueError("ABSAModel has not been initialized")
+
+        # 부모 process 의 model 을 fork 로 공유
+        _pool_model = model
+        self.model = model
+        self.num_workers = num_workers
+
+        core_groups = None
+        if pin_cores:
+            core_groups = [[cores[(i * threads_per_worker + j) % len(cores)] for j in range(threads_per_worker)]
+                           for i in range(num_workers)]
+            if num_workers * threads_per_worker > len(cores):
+                logging.warning("not enough cores to pin {} workers x {} threads".format(num_workers,
+                                                                                         threads_per_worker))
+
+        context = multiprocessing.get_context("fork")
+        worker_counter = context.Value('i', 0)
+        self.pool = context.Pool(num_workers, initializer=_init_worker,
+                                 initargs=(threads_per_worker, core_groups, worker_counter))
+
+    def analyze(self, corpus_list, sa=True, absa=False, chunk_size=None):
+        """
+            corpus_list 를 chunk 로 나누어 worker 에 분배하고, 결과를 원래 순서로 합친다
+
+            ABSAModel.analyze 와 같은 (result_0, result_1, result_2) 를 반환한다.
+        """
+        if chunk_size is None:
+            chunk_size = self.model.opt["batch_size"] * 4
+
+        chunks = [(corpus_list[i:i + chunk_size], sa, absa) for i in range(0, len(corpus_list), chunk_size)]
+        results = self.pool.map(_analyze_chunk, chunks)
+
+        merged = []
+        for result_idx, width in enumerate([2, 3, 3]):
+            enabled = sa if result_idx == 0 else absa
+            if not enabled:
+                merged.append(None)
+            elif len(results) == 0:
+                merged.append(np.zeros((0, width), dtype=float))
+            else:
+                merged.append(np.concatenate([result[result_idx] for result in results]))
+
+        return tuple(merged)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()